@@ -1,177 +1,330 @@
 import cv2
-from ultralytics import YOLO
+from detector_backends import load_plate_detector
 import easyocr
-import sqlite3
-import re
 import time
+from database import get_database
+from parking_lot import get_parking_lot
+from parking_slots import SlotClaim
+from plate_index import get_plate_index, sanitize_plate
+from plate_votes import PlateVoteAggregator
+from plate_tracker import PlateTracker
+from frame_capture import FrameGrabber
+from frame_scheduler import FrameScheduler
+from roi import RegionOfInterest
+from preview_renderer import PreviewRenderer
+from motion_gate import MotionGate
+from plate_ocr import recognize_crops, readtext_reading
+from latency_metrics import get_metrics
 
 class VehicleLicensePlateSystem:
-    def __init__(self, license_plate_model_path, db_path='users.db', event_queue=None, camera_number=1):
+    def __init__(self, license_plate_model_path, db_path='users.db', event_queue=None, camera_number=1, max_plate_distance=0.6, min_plate_score=0.85, use_kalman=False, inference_service=None, ocr_mode='recognize', ocr_fallback_confidence=0.4, load_text_detector=True, detector_backend=None, roi=None, motion_gate=True, slots=None, claim_slots=True, stop_event=None, preview=True, frame_ring=None, viewer=None, target_fps=None, idle_fps=None, latency_budget=None, frame_budget=None):
         self.event_queue = event_queue
         self.camera_number = camera_number
-        self.reader = easyocr.Reader(['en'], gpu=True)  # ← GPU=True now
-        self.license_plate_detector = YOLO(license_plate_model_path)
+        self.stop_event = stop_event
+        # Bays this camera watches (see site_config); defaults to the slot numbered like the camera
+        self.slots = list(slots) if slots else None
+        self.capture_stats = {}
+        # No rate cap by default (every frame the GPU keeps up with); cameras
+        # sharing this process still split its time, see frame_scheduler
+        self.scheduler = FrameScheduler(camera_number, target_fps, idle_fps, latency_budget, budget=frame_budget)
+        # With a shared InferenceService all cameras use its detector and reader
+        # instead of loading their own copies of the models
+        self.inference_service = inference_service
+        if inference_service is None:
+            self.reader = easyocr.Reader(['en'], gpu=True, detector=load_text_detector)  # ← GPU=True now
+            self.license_plate_detector = load_plate_detector(license_plate_model_path, detector_backend)
+        else:
+            self.reader = inference_service.reader
+            self.license_plate_detector = inference_service.license_plate_detector
+            load_text_detector = inference_service.load_text_detector
+        # 'recognize' feeds YOLO crops straight to the recognition model and only
+        # falls back to a full readtext() pass (text detector + recognizer) when
+        # confidence is below ocr_fallback_confidence. 'readtext' always runs the
+        # full pass. Without the text detector loaded there is no fallback.
+        self.ocr_mode = ocr_mode if load_text_detector else 'recognize'
+        self.ocr_fallback_confidence = ocr_fallback_confidence if load_text_detector else 0.0
+        self.ocr_reads = 0  # plate crops sent to OCR
+        self.confirmed_plates = 0  # tracks whose votes settled on a plate
+        self.ocr_fallbacks = 0
         # self.license_plate_detector.to('cuda')
         self.db_path = db_path
+        # Long-lived per-thread connection instead of one connect() per query
+        self.db = get_database(db_path)
+        # Slot state lives in memory; parking_info is written behind it. Process
+        # workers (claim_slots=False) leave claiming to the process that owns it
+        self.claim_slots = claim_slots
+        self.parking_lot = get_parking_lot(db_path) if claim_slots else None
+        # Optional per-camera detection region, see roi.RegionOfInterest
+        self.roi = RegionOfInterest(roi) if roi is not None and not isinstance(roi, RegionOfInterest) else roi
+        # Preview window (and/or frame_ring.SharedFrameRing) drawn off the hot loop at
+        # display rate; preview=False without a ring runs headless
+        window_name = f"Cam {camera_number}: License Plate Recognition" if preview else None
+        self.renderer = PreviewRenderer(frame_ring=frame_ring, window_name=window_name, viewer=viewer,
+                                        roi=self.roi) if window_name or frame_ring is not None else None
+        # Skip the detector while the scene is static (see motion_gate.MotionGate)
+        self.motion_gate = MotionGate() if motion_gate is True else (motion_gate or None)
+        # Shared across cameras; loaded once and kept fresh in the background
+        self.plate_index = get_plate_index(db_path, max_plate_distance)
+        # Weighted edit distance allowed between the OCR read and a registered
+        # plate; O/0, I/1 style confusions cost 0.3, other edits cost 1.0, so the
+        # default accepts up to two confusions but never a different character.
+        # min_plate_score also rejects confusion-heavy matches on short plates
+        self.max_plate_distance = max_plate_distance
+        self.min_plate_score = min_plate_score
+        # Per-camera plate tracks and OCR votes; confirmed tracks are not OCR'd again
+        self.plate_tracker = PlateTracker(use_kalman=use_kalman)
+        self.plate_votes = PlateVoteAggregator(max_missed_frames=self.plate_tracker.max_age)
+        self.track_first_seen = {}  # track_id -> capture time of the first frame it was detected in
+        # Per-stage latency histograms (see latency_metrics); process workers
+        # send theirs to the dashboard every metrics_interval seconds
+        self.metrics = get_metrics().camera(camera_number)
+        self.metrics_interval = 5.0
+        self._metrics_sent = 0.0
 
-    def get_registered_plate_numbers(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT plate_number FROM users")
-            rows = cursor.fetchall()
-            registered_plates = [row[0].strip().upper() for row in rows if row[0]]
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            registered_plates = []
-        finally:
-            conn.close()
-        return registered_plates
-
-    def update_parking_info(self, plate_text, camera_number):
-        # sanitize plate
-        sanitized_plate = re.sub(r'[^A-Z0-9]', '', plate_text.upper())
-        if not sanitized_plate:
-            return
+    def detect_plates(self, frame, imgsz=None):
+        if self.inference_service:
+            return self.inference_service.detect(frame, imgsz=imgsz)
+        return self.license_plate_detector(frame, **({'imgsz': imgsz} if imgsz else {}))[0]
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def recognize_plates(self, crops):
+        # One batched recognition pass over every crop, no text detector
+        if self.inference_service:
+            return self.inference_service.recognize(crops)
+        return recognize_crops(self.reader, crops)
 
-        # determine which slot this camera maps to
-        try:
-            target_slot = int(camera_number)
-        except ValueError:
-            print(f"Invalid camera number {camera_number}, cannot assign slot.")
-            conn.close()
-            return
+    def read_plates(self, crops):
+        """OCR plate crops according to ocr_mode; returns one (text, confidence) per crop."""
+        self.ocr_reads += len(crops)
+        if self.ocr_mode == 'readtext':
+            return [readtext_reading(self.readtext(crop, detail=1)) if crop.size else ("", 0.0) for crop in crops]
+        readings = self.recognize_plates(crops)
+        for i, (plate_text, ocr_confidence) in enumerate(readings):
+            if ocr_confidence >= self.ocr_fallback_confidence or not crops[i].size:
+                continue
+            self.ocr_fallbacks += 1
+            fallback = readtext_reading(self.readtext(crops[i], detail=1))
+            if fallback[1] > ocr_confidence:
+                readings[i] = fallback
+        return readings
 
-        # clamp to your maximum slots (here assumed to be 2)
-        MAX_SLOTS = 2
-        target_slot = min(max(1, target_slot), MAX_SLOTS)
-
-        # 1) Check if this plate already exists in ANY occupied slot (other than the target)
-        cursor.execute("""
-                       SELECT slot_number
-                       FROM parking_info
-                       WHERE slot_status = 'occupied'
-                         AND plate_number = ?
-                         AND slot_number != ?
-                       """, (sanitized_plate, target_slot))
-        duplicate_row = cursor.fetchone()
-        if duplicate_row:
-            existing_slot = duplicate_row[0]
-            print(
-                f"Plate {sanitized_plate} is already parked in slot {existing_slot}; cannot assign to slot {target_slot}.")
-            conn.close()
-            return
+    def readtext(self, image, **kwargs):
+        if self.inference_service:
+            return self.inference_service.readtext(image, **kwargs)
+        return self.reader.readtext(image, **kwargs)
 
-        # 2) Fetch status of the target slot
-        cursor.execute("""
-                       SELECT slot_status, plate_number
-                       FROM parking_info
-                       WHERE slot_number = ?
-                       """, (target_slot,))
-        row = cursor.fetchone()
-
-        if not row:
-            print(f"Slot {target_slot} does not exist in the database.")
-            conn.close()
-            return
-
-        slot_status, existing_plate = row
+    def get_registered_plate_numbers(self):
+        return list(self.plate_index.snapshot())
 
-        # if target slot is already occupied...
-        if slot_status == 'occupied':
-            if existing_plate == sanitized_plate:
-                # same car in same slot → nothing to do
-                print(f"Plate {sanitized_plate} is already parked in slot {target_slot}.")
-            else:
-                # occupied by a different car → block
-                print(f"Slot {target_slot} is occupied by {existing_plate}; cannot assign to {sanitized_plate}.")
-            conn.close()
-            return
+    def update_parking_info(self, plate_text, camera_number, confidence=None, first_seen=None):
+        # sanitize plate
+        sanitized_plate = sanitize_plate(plate_text)
+        if not sanitized_plate:
+            return None
 
-        # 3) Slot is empty and no duplicates elsewhere → occupy it
-        cursor.execute("""
-                       UPDATE parking_info
-                       SET slot_status  = 'occupied',
-                           plate_number = ?
-                       WHERE slot_number = ?
-                       """, (sanitized_plate, target_slot))
-        conn.commit()
+        # determine which slot(s) this camera maps to
+        if self.slots:
+            target_slots = self.slots
+        else:
+            try:
+                target_slots = [int(camera_number)]
+            except ValueError:
+                print(f"Invalid camera number {camera_number}, cannot assign slot.")
+                return None
 
-        if self.event_queue:
-            self.event_queue.put(("match", self.camera_number, sanitized_plate))
+        if not self.claim_slots:
+            # Report the confirmed plate; see recognition_workers.claim_reported_plate
+            if self.event_queue:
+                self.event_queue.put(("plate", self.camera_number, sanitized_plate, target_slots, confidence,
+                                      self.event_timing(first_seen)))
+            return None
+        # Decided against the in-memory slot state; persisted in the background
+        result, slot_number = self.parking_lot.claim(sanitized_plate, target_slots, self.camera_number, confidence)
+        if result is SlotClaim.ASSIGNED:
+            if self.event_queue:
+                self.event_queue.put(("match", self.camera_number, sanitized_plate, slot_number,
+                                      self.event_timing(first_seen)))
+            print(f"Assigned plate {sanitized_plate} to slot {slot_number}.")
+        elif result is SlotClaim.PARKED_ELSEWHERE:
+            print(f"Plate {sanitized_plate} is already parked in slot {slot_number}; cannot assign to slot {target_slots}.")
+        elif result is SlotClaim.ALREADY_PARKED:
+            # same car in same slot → nothing to do
+            print(f"Plate {sanitized_plate} is already parked in slot {slot_number}.")
+        elif result is SlotClaim.SLOT_OCCUPIED:
+            # occupied by a different car → block
+            print(f"Slot {target_slots} is occupied; cannot assign to {sanitized_plate}.")
+        else:
+            print(f"Slot {target_slots} does not exist in the database.")
+        return result
 
-        print(f"Assigned plate {sanitized_plate} to slot {target_slot}.")
-        conn.close()
+    def match_registered_plate(self, sanitized_plate):
+        """Return the registered plate a sanitized OCR read refers to, or None."""
+        if sanitized_plate in self.plate_index:
+            return sanitized_plate
+        match = self.plate_index.best_match(sanitized_plate, self.max_plate_distance)
+        if match and not match.ambiguous and match.score >= self.min_plate_score:
+            return match.plate
+        return None
 
-    def compare_plate_number(self, recognized_plate, camera_number):
-        sanitized_plate = re.sub('[^A-Z0-9]', '', recognized_plate.upper())
+    def compare_plate_number(self, recognized_plate, camera_number, confidence=None, first_seen=None):
+        sanitized_plate = sanitize_plate(recognized_plate)
         if not sanitized_plate:
             return False
 
-        registered_plates = self.get_registered_plate_numbers()
-        if sanitized_plate in registered_plates:
-            print(f"Match found: {sanitized_plate}")
-            self.update_parking_info(sanitized_plate, camera_number)
+        registered_plate = self.match_registered_plate(sanitized_plate)
+        if registered_plate:
+            if registered_plate == sanitized_plate:
+                print(f"Match found: {sanitized_plate}")
+            else:
+                print(f"Match found: {registered_plate} (read {sanitized_plate})")
+            self.update_parking_info(registered_plate, camera_number, confidence, first_seen)
             return True
         else:
             print(f"No match for: {sanitized_plate}")
             return False
 
+    def add_plate_reading(self, track_id, plate_text, ocr_confidence):
+        """Vote with one OCR reading; returns the plate the first time its track is confirmed."""
+        sanitized_plate = sanitize_plate(plate_text)
+        # Misreads of the same registered plate vote together
+        vote = (self.match_registered_plate(sanitized_plate) or sanitized_plate) if sanitized_plate else None
+        return self.plate_votes.add_reading(track_id, vote, ocr_confidence)
+
+    def event_timing(self, first_seen=None):
+        """Timestamps carried by match events, for latency_metrics.record_gate_open()."""
+        now = time.time()
+        return {"first_seen": first_seen or now, "sent": now}
+
+    def report_metrics(self, force=False):
+        now = time.time()
+        if not force and now - self._metrics_sent < self.metrics_interval:
+            return
+        self._metrics_sent = now
+        if self.motion_gate:
+            self.metrics.set_gauges("motion_gate", self.motion_gate.stats())
+        # Process workers have their own registry; ship it to the dashboard's
+        if not self.claim_slots and self.event_queue:
+            self.event_queue.put(("metrics", self.camera_number, self.metrics.snapshot()))
+
+    def process_frame(self, frame, frame_time=None):
+        """Detect, track and read the plates in one frame.
+
+        Returns (detection, track_id, plate_text) for every plate found, or an
+        empty list when the motion gate decided the frame is not worth a
+        detector pass.
+        """
+        # Only the camera's region of interest is sent to the detector;
+        # boxes come back in full-frame coordinates
+        detector_input = self.roi.prepare(frame) if self.roi else frame
+        if self.motion_gate and not self.motion_gate.should_run(detector_input):
+            return []
+
+        # Detect license plates in the frame, at a smaller model input size
+        # when the scheduler finds the camera can't keep up
+        started = time.perf_counter()
+        lp_results = self.detect_plates(detector_input, self.scheduler.imgsz)
+        lp_detections = lp_results.boxes.data.tolist()
+        self.metrics.record("detect", time.perf_counter() - started)
+        if self.roi:
+            lp_detections = self.roi.to_frame(lp_detections)
+        track_ids = self.plate_tracker.update(lp_detections)
+        frame_time = frame_time or time.time()
+        for track_id in track_ids:
+            self.track_first_seen.setdefault(track_id, frame_time)
+
+        # Crop every plate that still needs OCR and read them in one batch
+        started = time.perf_counter()
+        ocr_tracks, ocr_crops = [], []
+        for lp, track_id in zip(lp_detections, track_ids):
+            if not self.plate_votes.needs_ocr(track_id):
+                continue
+            x1_lp, y1_lp, x2_lp, y2_lp = (int(v) for v in lp[:4])
+            # Crop the detected license plate region
+            lp_crop = frame[max(y1_lp, 0):y2_lp, max(x1_lp, 0):x2_lp]
+            # Convert to grayscale to potentially improve OCR accuracy and reduce computation
+            ocr_crops.append(cv2.cvtColor(lp_crop, cv2.COLOR_BGR2GRAY) if lp_crop.size else lp_crop)
+            ocr_tracks.append(track_id)
+        if ocr_crops:
+            self.metrics.record("crop", time.perf_counter() - started)
+            started = time.perf_counter()
+            readings = self.read_plates(ocr_crops)
+            self.metrics.record("ocr", time.perf_counter() - started)
+        else:
+            readings = []
+
+        plate_texts = {}
+        for track_id, (plate_text, ocr_confidence) in zip(ocr_tracks, readings):
+            plate_texts[track_id] = plate_text
+            confirmed_plate = self.add_plate_reading(track_id, plate_text, ocr_confidence)
+            # Perform plate comparison once enough frames agree on the plate
+            if confirmed_plate:
+                self.confirmed_plates += 1
+                started = time.perf_counter()
+                self.compare_plate_number(confirmed_plate, self.camera_number,
+                                          self.plate_votes.confirmed_confidence(track_id),
+                                          self.track_first_seen.get(track_id))
+                self.metrics.record("match", time.perf_counter() - started)
+        self.plate_votes.end_frame(track_ids)
+        active_tracks = set(self.plate_tracker.active_ids())
+        for track_id in [t for t in self.track_first_seen if t not in active_tracks]:
+            del self.track_first_seen[track_id]
+
+        return [(lp, track_id, plate_texts.get(track_id) or self.plate_votes.confirmed_plate(track_id) or "")
+                for lp, track_id in zip(lp_detections, track_ids)]
+
     def process_video(self, video_path):
-        cap = cv2.VideoCapture(video_path)
+        # Capture runs on its own thread; this loop always takes the newest frame
+        grabber = FrameGrabber(video_path).start()
+        if self.inference_service:
+            self.inference_service.add_producer()
+        if self.renderer:
+            self.renderer.start()
         prev_time = time.time()
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            # resized_frame = cv2.resize(frame, (1280, 720))
-            resized_frame = frame
-
-            # Set frame dimensions if desired (optional)
-            # cap.set(3, 640)
-            # cap.set(4, 480)
+        while not (self.stop_event and self.stop_event.is_set()):
+            wait = self.scheduler.delay()
+            if wait > 0:
+                if self.stop_event:
+                    self.stop_event.wait(wait)
+                else:
+                    time.sleep(wait)
+                continue
+            frame_number, frame = grabber.read(timeout=1.0)
+            if frame is None:
+                if grabber.is_done():
+                    break
+                continue
+            frame_time = grabber.last_frame_time
+            self.metrics.record("capture", time.time() - frame_time)
 
             current_time = time.time()
             elapsed_time = current_time - prev_time
             fps = 1.0 / elapsed_time if elapsed_time > 0 else 0
             prev_time = current_time
 
-            # Detect license plates in the frame
-            lp_results = self.license_plate_detector(resized_frame)[0]
-            lp_detections = lp_results.boxes.data.tolist()
-            annotated_frame = resized_frame.copy()
-
-            for lp in lp_detections:
-                x1_lp, y1_lp, x2_lp, y2_lp, lp_score, lp_class_id = lp
-                # Crop the detected license plate region
-                lp_crop = frame[int(y1_lp):int(y2_lp), int(x1_lp):int(x2_lp)]
-                # Convert to grayscale to potentially improve OCR accuracy and reduce computation
-                lp_crop_gray = cv2.cvtColor(lp_crop, cv2.COLOR_BGR2GRAY)
-                ocr_results = self.reader.readtext(lp_crop_gray, detail=0)
-                plate_text = ocr_results[0].strip() if ocr_results else ""
-                # Perform plate comparison if text was detected
-                if plate_text:
-                    self.compare_plate_number(plate_text, self.camera_number)
-                # Annotate the frame
-                cv2.rectangle(annotated_frame, (int(x1_lp), int(y1_lp)), (int(x2_lp), int(y2_lp)), (0, 0, 255), 2)
-                cv2.putText(annotated_frame, plate_text, (int(x1_lp), int(y1_lp) - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-
-            # Display the real-time FPS on the frame
-            cv2.putText(annotated_frame, f"FPS: {fps:.2f}", (50, 100),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (50, 255, 0), 2)
-            window_name = f"Cam {self.camera_number}: License Plate Recognition"
-            cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-            cv2.resizeWindow(window_name, 800, 600)
-            cv2.imshow(window_name, annotated_frame)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
-
-        cap.release()
-        cv2.destroyWindow(window_name)
+            started = time.perf_counter()
+            detections = self.process_frame(frame, frame_time)
+            self.scheduler.frame_done(time.perf_counter() - started, self.plate_tracker.active_ids())
+            self.report_metrics()
+            if self.renderer:
+                # Pressing q in the preview window stops this camera
+                if self.renderer.closed:
+                    break
+                self.renderer.submit(frame, detections, fps)
+
+        grabber.stop()
+        self.scheduler.close()
+        if self.inference_service:
+            self.inference_service.remove_producer()
+        self.report_metrics(force=True)
+        if self.renderer:
+            self.renderer.stop()
+        if self.parking_lot:
+            self.parking_lot.journal.flush(timeout=2.0)
+        self.capture_stats = grabber.stats()
+        print(f"Cam {self.camera_number}: captured {self.capture_stats['captured']} frames, "
+              f"processed {self.capture_stats['read']}, dropped {self.capture_stats['dropped']}")
+        if self.motion_gate:
+            print(f"Cam {self.camera_number}: motion gate passed {self.motion_gate.passed} of "
+                  f"{self.motion_gate.checks} frames ({self.motion_gate.hit_rate():.0%})")
         return
 
 if __name__ == "__main__":
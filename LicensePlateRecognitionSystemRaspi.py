@@ -2,148 +2,320 @@ import cv2
 import os
 os.environ['YOLO_AUTOINSTALL'] = 'false'
 os.environ['YOLO_VERBOSE'] = 'false'
-from ultralytics import YOLO
+from detector_backends import load_plate_detector
 import easyocr
-import sqlite3
-import re
 import time
+from database import get_database
+from parking_lot import get_parking_lot
+from parking_slots import SlotClaim
+from plate_index import get_plate_index, sanitize_plate
+from plate_votes import PlateVoteAggregator
+from plate_tracker import PlateTracker
+from frame_capture import FrameGrabber
+from frame_scheduler import FrameScheduler
+from roi import RegionOfInterest
+from preview_renderer import PreviewRenderer
+from motion_gate import MotionGate
+from plate_ocr import recognize_crops, readtext_reading
+from latency_metrics import get_metrics
 
 class VehicleLicensePlateSystem:
-    def __init__(self, license_plate_model_path, db_path='users.db', event_queue=None, camera_number=1, frame_queue=None, stop_event=None):
+    def __init__(self, license_plate_model_path, db_path='users.db', event_queue=None, camera_number=1, stop_event=None, max_plate_distance=0.6, min_plate_score=0.85, use_kalman=False, inference_service=None, ocr_mode='recognize', ocr_fallback_confidence=0.4, load_text_detector=True, detector_backend=None, roi=None, motion_gate=True, slots=None, claim_slots=True, frame_ring=None, viewer=None, target_fps=4.0, idle_fps=None, latency_budget=None, frame_budget=None):
         self.event_queue = event_queue
         self.camera_number = camera_number
-        self.frame_queue = frame_queue
+        # Bays this camera watches (see site_config); defaults to the slot numbered like the camera
+        self.slots = list(slots) if slots else None
         self.stop_event = stop_event
-        self.reader = easyocr.Reader(['en'], gpu=False, detector='dbnet18')
-        self.license_plate_detector = YOLO(license_plate_model_path)
+        # Paces processing to target_fps, backing off (rate first, then detector
+        # resolution) when the measured frame time doesn't fit; see frame_scheduler
+        self.scheduler = FrameScheduler(camera_number, target_fps, idle_fps, latency_budget, budget=frame_budget)
+        self.capture_stats = {}
+        # With a shared InferenceService all cameras use its detector and reader
+        # instead of loading their own copies of the models
+        self.inference_service = inference_service
+        if inference_service is None:
+            self.reader = easyocr.Reader(['en'], gpu=False, detect_network='dbnet18', detector=load_text_detector)
+            self.license_plate_detector = load_plate_detector(license_plate_model_path, detector_backend)
+        else:
+            self.reader = inference_service.reader
+            self.license_plate_detector = inference_service.license_plate_detector
+            load_text_detector = inference_service.load_text_detector
+        # 'recognize' feeds YOLO crops straight to the recognition model and only
+        # falls back to a full readtext() pass (text detector + recognizer) when
+        # confidence is below ocr_fallback_confidence. 'readtext' always runs the
+        # full pass. Without the text detector loaded there is no fallback.
+        self.ocr_mode = ocr_mode if load_text_detector else 'recognize'
+        self.ocr_fallback_confidence = ocr_fallback_confidence if load_text_detector else 0.0
+        self.ocr_reads = 0  # plate crops sent to OCR
+        self.confirmed_plates = 0  # tracks whose votes settled on a plate
+        self.ocr_fallbacks = 0
         # self.license_plate_detector.to('cuda')
         self.db_path = db_path
+        # Long-lived per-thread connection instead of one connect() per query
+        self.db = get_database(db_path)
+        # Slot state lives in memory; parking_info is written behind it. Process
+        # workers (claim_slots=False) leave claiming to the process that owns it
+        self.claim_slots = claim_slots
+        self.parking_lot = get_parking_lot(db_path) if claim_slots else None
+        # Optional per-camera detection region, see roi.RegionOfInterest
+        self.roi = RegionOfInterest(roi) if roi is not None and not isinstance(roi, RegionOfInterest) else roi
+        # Preview goes to a frame_ring.SharedFrameRing, drawn off the hot loop and
+        # only while viewer is set; without a ring nothing is drawn at all
+        self.renderer = PreviewRenderer(frame_ring=frame_ring, viewer=viewer, roi=self.roi) if frame_ring is not None else None
+        # Skip the detector while the scene is static (see motion_gate.MotionGate)
+        self.motion_gate = MotionGate() if motion_gate is True else (motion_gate or None)
+        # Shared across cameras; loaded once and kept fresh in the background
+        self.plate_index = get_plate_index(db_path, max_plate_distance)
+        # Weighted edit distance allowed between the OCR read and a registered
+        # plate; O/0, I/1 style confusions cost 0.3, other edits cost 1.0, so the
+        # default accepts up to two confusions but never a different character.
+        # min_plate_score also rejects confusion-heavy matches on short plates
+        self.max_plate_distance = max_plate_distance
+        self.min_plate_score = min_plate_score
+        # Per-camera plate tracks and OCR votes; confirmed tracks are not OCR'd again
+        self.plate_tracker = PlateTracker(use_kalman=use_kalman)
+        self.plate_votes = PlateVoteAggregator(max_missed_frames=self.plate_tracker.max_age)
+        self.track_first_seen = {}  # track_id -> capture time of the first frame it was detected in
+        # Per-stage latency histograms (see latency_metrics); process workers
+        # send theirs to the dashboard every metrics_interval seconds
+        self.metrics = get_metrics().camera(camera_number)
+        self.metrics_interval = 5.0
+        self._metrics_sent = 0.0
+
+    def detect_plates(self, frame, imgsz=None):
+        if self.inference_service:
+            return self.inference_service.detect(frame, imgsz=imgsz)
+        return self.license_plate_detector(frame, **({'imgsz': imgsz} if imgsz else {}))[0]
+
+    def recognize_plates(self, crops):
+        # One batched recognition pass over every crop, no text detector
+        if self.inference_service:
+            return self.inference_service.recognize(crops)
+        return recognize_crops(self.reader, crops)
+
+    def read_plates(self, crops):
+        """OCR plate crops according to ocr_mode; returns one (text, confidence) per crop."""
+        self.ocr_reads += len(crops)
+        if self.ocr_mode == 'readtext':
+            return [readtext_reading(self.readtext(crop, detail=1)) if crop.size else ("", 0.0) for crop in crops]
+        readings = self.recognize_plates(crops)
+        for i, (plate_text, ocr_confidence) in enumerate(readings):
+            if ocr_confidence >= self.ocr_fallback_confidence or not crops[i].size:
+                continue
+            self.ocr_fallbacks += 1
+            fallback = readtext_reading(self.readtext(crops[i], detail=1))
+            if fallback[1] > ocr_confidence:
+                readings[i] = fallback
+        return readings
+
+    def readtext(self, image, **kwargs):
+        if self.inference_service:
+            return self.inference_service.readtext(image, **kwargs)
+        return self.reader.readtext(image, **kwargs)
 
     def get_registered_plate_numbers(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT plate_number FROM users")
-            rows = cursor.fetchall()
-            registered_plates = [row[0].strip().upper() for row in rows if row[0]]
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            registered_plates = []
-        finally:
-            conn.close()
-        return registered_plates
-
-    def update_parking_info(self, plate_text, camera_number):
-        sanitized_plate = re.sub('[^A-Z0-9]', '', plate_text.upper())
+        return list(self.plate_index.snapshot())
+
+    def update_parking_info(self, plate_text, camera_number, confidence=None, first_seen=None):
+        sanitized_plate = sanitize_plate(plate_text)
         if not sanitized_plate:
-            return
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT slot_number FROM parking_info WHERE slot_status = 'occupied' AND plate_number = ?", (sanitized_plate,))
-        already_parked = cursor.fetchone()
-        if already_parked:
-            print(f"Plate {sanitized_plate} is already parked in slot {already_parked[0]}")
-            conn.close()
-            return
-        cursor.execute("SELECT slot_number FROM parking_info WHERE slot_status = 'empty' ORDER BY slot_number ASC LIMIT 1")
-        result = cursor.fetchone()
-        if result:
+            return None
+        if self.slots:
+            target_slots = self.slots
+        else:
             try:
-                slot_number = int(camera_number)
-                if slot_number > 2: # Assuming 2 is the max number of slots
-                    slot_number = 2
-            except:
-                slot_number = result[0]
-            cursor.execute("""
-                UPDATE parking_info 
-                SET slot_status = 'occupied', plate_number = ? 
-                WHERE slot_number = ?
-            """, (sanitized_plate, slot_number))
-            conn.commit()
+                target_slots = int(camera_number)
+            except (TypeError, ValueError):
+                target_slots = None  # first empty slot
+        if not self.claim_slots:
+            # Report the confirmed plate; see recognition_workers.claim_reported_plate
+            if self.event_queue:
+                self.event_queue.put(("plate", self.camera_number, sanitized_plate, target_slots, confidence,
+                                      self.event_timing(first_seen)))
+            return None
+        # Decided against the in-memory slot state; persisted in the background
+        result, slot_number = self.parking_lot.claim(sanitized_plate, target_slots, self.camera_number, confidence)
+        if result is SlotClaim.ASSIGNED:
             if self.event_queue:
-                self.event_queue.put(("match", self.camera_number, sanitized_plate))
+                self.event_queue.put(("match", self.camera_number, sanitized_plate, slot_number,
+                                      self.event_timing(first_seen)))
             print(f"Updated slot {slot_number} with plate {sanitized_plate}")
-        else:
+        elif result is SlotClaim.NO_SLOT:
             print("No available slot.")
-        conn.close()
+        else:
+            print(f"Plate {sanitized_plate} not assigned to slot {slot_number}: {result.value}")
+        return result
+
+    def match_registered_plate(self, sanitized_plate):
+        """Return the registered plate a sanitized OCR read refers to, or None."""
+        if sanitized_plate in self.plate_index:
+            return sanitized_plate
+        match = self.plate_index.best_match(sanitized_plate, self.max_plate_distance)
+        if match and not match.ambiguous and match.score >= self.min_plate_score:
+            return match.plate
+        return None
 
-    def compare_plate_number(self, recognized_plate, camera_number):
-        sanitized_plate = re.sub('[^A-Z0-9]', '', recognized_plate.upper())
+    def compare_plate_number(self, recognized_plate, camera_number, confidence=None, first_seen=None):
+        sanitized_plate = sanitize_plate(recognized_plate)
         if not sanitized_plate:
             return False
 
-        registered_plates = self.get_registered_plate_numbers()
-        if sanitized_plate in registered_plates:
-            print(f"Match found: {sanitized_plate}")
-            self.update_parking_info(sanitized_plate, camera_number)
+        registered_plate = self.match_registered_plate(sanitized_plate)
+        if registered_plate:
+            if registered_plate == sanitized_plate:
+                print(f"Match found: {sanitized_plate}")
+            else:
+                print(f"Match found: {registered_plate} (read {sanitized_plate})")
+            self.update_parking_info(registered_plate, camera_number, confidence, first_seen)
             return True
         else:
             print(f"No match for: {sanitized_plate}")
             return False
 
-    def process_video(self, video_path):
-        cap = cv2.VideoCapture(video_path)
-        # Set frame dimensions if desired (optional)
-        # cap.set(3, 640) #640
-        # cap.set(4, 480) #480
+    def add_plate_reading(self, track_id, plate_text, ocr_confidence):
+        """Vote with one OCR reading; returns the plate the first time its track is confirmed."""
+        sanitized_plate = sanitize_plate(plate_text)
+        # Misreads of the same registered plate vote together
+        vote = (self.match_registered_plate(sanitized_plate) or sanitized_plate) if sanitized_plate else None
+        return self.plate_votes.add_reading(track_id, vote, ocr_confidence)
 
-        frame_skip = 8
-        frame_count = 0
+    def event_timing(self, first_seen=None):
+        """Timestamps carried by match events, for latency_metrics.record_gate_open()."""
+        now = time.time()
+        return {"first_seen": first_seen or now, "sent": now}
 
-        prev_time = time.time()
-        while cap.isOpened() and not (self.stop_event and self.stop_event.is_set()):
-            ret, frame = cap.read()
-            if not ret:
-                break
+    def report_metrics(self, force=False):
+        now = time.time()
+        if not force and now - self._metrics_sent < self.metrics_interval:
+            return
+        self._metrics_sent = now
+        if self.motion_gate:
+            self.metrics.set_gauges("motion_gate", self.motion_gate.stats())
+        # Process workers have their own registry; ship it to the dashboard's
+        if not self.claim_slots and self.event_queue:
+            self.event_queue.put(("metrics", self.camera_number, self.metrics.snapshot()))
+
+    def process_frame(self, frame, frame_time=None):
+        """Detect, track and read the plates in one frame.
 
-            frame_count += 1
-            if frame_count < frame_skip:
-                continue  # Skip processing this frame
+        Returns (detection, track_id, plate_text) for every plate found, or an
+        empty list when the motion gate decided the frame is not worth a
+        detector pass.
+        """
+        # Only the camera's region of interest is sent to the detector;
+        # boxes come back in full-frame coordinates
+        detector_input = self.roi.prepare(frame) if self.roi else frame
+        if self.motion_gate and not self.motion_gate.should_run(detector_input):
+            return []
+
+        # Detect license plates in the frame, at a smaller model input size
+        # when the scheduler finds the camera can't keep up
+        started = time.perf_counter()
+        lp_results = self.detect_plates(detector_input, self.scheduler.imgsz)
+        lp_detections = lp_results.boxes.data.tolist()
+        self.metrics.record("detect", time.perf_counter() - started)
+        if self.roi:
+            lp_detections = self.roi.to_frame(lp_detections)
+        lp_detections = [lp for lp in lp_detections if lp[4] > 0.3]
+        track_ids = self.plate_tracker.update(lp_detections)
+        frame_time = frame_time or time.time()
+        for track_id in track_ids:
+            self.track_first_seen.setdefault(track_id, frame_time)
+
+        # Crop every plate that still needs OCR and read them in one batch
+        started = time.perf_counter()
+        ocr_tracks, ocr_crops = [], []
+        for lp, track_id in zip(lp_detections, track_ids):
+            if not self.plate_votes.needs_ocr(track_id):
+                continue
+            x1_lp, y1_lp, x2_lp, y2_lp = (int(v) for v in lp[:4])
+            # Crop the detected license plate region
+            lp_crop = frame[max(y1_lp, 0):y2_lp, max(x1_lp, 0):x2_lp]
+            # Convert to grayscale to potentially improve OCR accuracy and reduce computation
+            ocr_crops.append(cv2.cvtColor(lp_crop, cv2.COLOR_BGR2GRAY) if lp_crop.size else lp_crop)
+            ocr_tracks.append(track_id)
+        if ocr_crops:
+            self.metrics.record("crop", time.perf_counter() - started)
+            started = time.perf_counter()
+            readings = self.read_plates(ocr_crops)
+            self.metrics.record("ocr", time.perf_counter() - started)
+        else:
+            readings = []
+
+        plate_texts = {}
+        for track_id, (plate_text, ocr_confidence) in zip(ocr_tracks, readings):
+            plate_texts[track_id] = plate_text
+            confirmed_plate = self.add_plate_reading(track_id, plate_text, ocr_confidence)
+            # Perform plate comparison once enough frames agree on the plate
+            if confirmed_plate:
+                self.confirmed_plates += 1
+                started = time.perf_counter()
+                self.compare_plate_number(confirmed_plate, self.camera_number,
+                                          self.plate_votes.confirmed_confidence(track_id),
+                                          self.track_first_seen.get(track_id))
+                self.metrics.record("match", time.perf_counter() - started)
+        self.plate_votes.end_frame(track_ids)
+        active_tracks = set(self.plate_tracker.active_ids())
+        for track_id in [t for t in self.track_first_seen if t not in active_tracks]:
+            del self.track_first_seen[track_id]
+
+        return [(lp, track_id, plate_texts.get(track_id) or self.plate_votes.confirmed_plate(track_id) or "")
+                for lp, track_id in zip(lp_detections, track_ids)]
+
+    def process_video(self, video_path):
+        # Capture runs on its own thread; this loop always takes the newest frame
+        grabber = FrameGrabber(video_path).start()
+        if self.inference_service:
+            self.inference_service.add_producer()
+        if self.renderer:
+            self.renderer.start()
+
+        prev_time = time.time()
+        while not (self.stop_event and self.stop_event.is_set()):
+            # Wait until the scheduler wants the next frame, then take the newest one
+            wait = self.scheduler.delay()
+            if wait > 0:
+                if self.stop_event:
+                    self.stop_event.wait(wait)
+                else:
+                    time.sleep(wait)
+                continue
 
-            frame_count = 0
-            # resized_frame = cv2.resize(frame, (1280, 720))
-            # resized_frame = cv2.resize(frame, None, fx=0.5, fy=0.5)
-            resized_frame = frame
+            frame_number, frame = grabber.read(timeout=1.0)
+            if frame is None:
+                if grabber.is_done():
+                    break
+                continue
+            frame_time = grabber.last_frame_time
+            self.metrics.record("capture", time.time() - frame_time)
 
             current_time = time.time()
             elapsed_time = current_time - prev_time
             fps = 1.0 / elapsed_time if elapsed_time > 0 else 0
             prev_time = current_time
 
-            # Detect license plates in the frame
-            lp_results = self.license_plate_detector(resized_frame)[0]
-            lp_detections = lp_results.boxes.data.tolist()
-            annotated_frame = resized_frame.copy()
-
-            for lp in lp_detections:
-                x1_lp, y1_lp, x2_lp, y2_lp, lp_score, lp_class_id = lp
-                # Crop the detected license plate region
-                lp_crop = frame[int(y1_lp):int(y2_lp), int(x1_lp):int(x2_lp)] if lp_score > 0.3 else None
-                if lp_crop is None:
-                    continue
-                # Convert to grayscale to potentially improve OCR accuracy and reduce computation
-                lp_crop_gray = cv2.cvtColor(lp_crop, cv2.COLOR_BGR2GRAY)
-                ocr_results = self.reader.readtext(lp_crop_gray, detail=0, batch_size=5)
-                plate_text = ocr_results[0].strip() if ocr_results else ""
-                # Perform plate comparison if text was detected
-                if plate_text:
-                    self.compare_plate_number(plate_text, self.camera_number)
-                # Annotate the frame
-                cv2.rectangle(annotated_frame, (int(x1_lp), int(y1_lp)), (int(x2_lp), int(y2_lp)), (0, 0, 255), 2)
-                cv2.putText(annotated_frame, plate_text, (int(x1_lp), int(y1_lp) - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
-            # Display the real-time FPS on the frame
-            cv2.putText(annotated_frame, f"FPS: {fps:.2f}", (50, 100),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (50, 255, 0), 2)
-            annotated_frame = cv2.resize(annotated_frame, (800, 600))
-            if self.frame_queue:
-                # overwrite the queue if it's full so only the latest frame is kept
-                try:
-                    self.frame_queue.get_nowait()
-                except:
-                    pass
-                self.frame_queue.put(annotated_frame)
-        cap.release()
+            started = time.perf_counter()
+            detections = self.process_frame(frame, frame_time)
+            self.scheduler.frame_done(time.perf_counter() - started, self.plate_tracker.active_ids())
+            self.report_metrics()
+            # No copies or drawing here; the renderer skips the frame unless someone is watching
+            if self.renderer:
+                self.renderer.submit(frame, detections, fps)
+        grabber.stop()
+        self.scheduler.close()
+        if self.inference_service:
+            self.inference_service.remove_producer()
+        self.report_metrics(force=True)
+        if self.renderer:
+            self.renderer.stop()
+        if self.parking_lot:
+            self.parking_lot.journal.flush(timeout=2.0)
+        self.capture_stats = grabber.stats()
+        print(f"Cam {self.camera_number}: captured {self.capture_stats['captured']} frames, "
+              f"processed {self.capture_stats['read']}, dropped {self.capture_stats['dropped']}")
+        if self.motion_gate:
+            print(f"Cam {self.camera_number}: motion gate passed {self.motion_gate.passed} of "
+                  f"{self.motion_gate.checks} frames ({self.motion_gate.hit_rate():.0%})")
         return
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+"""Accuracy and cost of the recognition pipeline against the expected plates of the sample videos.
+
+    python accuracy_report.py --output report.json
+    python accuracy_report.py --truth truth.json --frame-step 4 --ocr-mode readtext --compare report.json
+
+Replays the videos like replay_benchmark.py (same options) and scores the
+match events: time to the first correct match, false matches and OCR calls
+per confirmed plate, next to fps and stage latency, so a speed change can
+be judged by what it costs in accuracy. Every frame (or every
+--frame-step'th) is processed whatever the machine speed, so two reports
+are comparable when they processed the same frames.
+
+By default every plate in dashboard/license_plates_sample.txt is expected
+in every video. A --truth file maps each video to the plates that really
+appear in it ({"video/sample_2.mp4": ["NBC 1234"], ...}); plates expected
+only in other videos are then registered too, so a misread landing on one
+of them shows up as a false match.
+"""
+import argparse
+import json
+
+from plate_index import sanitize_plate
+from replay_benchmark import add_replay_arguments, load_plates, run_replay
+
+
+def load_truth(path, videos, sample_plates):
+    """{video: set of sanitized plates expected in it}."""
+    if path is None:
+        expected = {sanitize_plate(plate) for plate in sample_plates}
+        return {video: expected for video in videos}
+    with open(path) as f:
+        truth = json.load(f)
+    return {video: {sanitize_plate(plate) for plate in truth.get(video, [])} for video in videos}
+
+
+def score_video(result, expected):
+    """Score one replayed video from its match events.
+
+    The replay database has a slot for every registered plate, so each
+    plate read in the video gets its own match and recall is not capped
+    by free slots.
+    """
+    matches = result["matches"]
+    correct = [match for match in matches if match["plate_number"] in expected]
+    false_matches = [match for match in matches if match["plate_number"] not in expected]
+    found = {match["plate_number"] for match in correct}
+    first_correct = correct[0] if correct else None
+    ocr_calls = result["ocr_reads"] + result["ocr_fallbacks"]
+    return {
+        "video": result["video"],
+        "frames": result["frames"],
+        "expected": sorted(expected),
+        "found": sorted(found),
+        "missed": sorted(expected - found),
+        "false_matches": false_matches,
+        "time_to_first_correct_match": first_correct["video_time"] if first_correct else None,
+        "replay_time_to_first_correct_match": first_correct["replay_time"] if first_correct else None,
+        "ocr_calls": ocr_calls,
+        "confirmed_plates": result["confirmed_plates"],
+        "ocr_calls_per_confirmed_plate": round(ocr_calls / result["confirmed_plates"], 2)
+        if result["confirmed_plates"] else None,
+        "ocr_calls_per_frame": result["ocr_calls_per_frame"],
+        "fps": result["fps"],
+        "p95_ms": {stage: summary["p95"] for stage, summary in result["stages_ms"].items()},
+    }
+
+
+def summarize(videos):
+    expected = sum(len(video["expected"]) for video in videos)
+    found = sum(len(video["found"]) for video in videos)
+    false_matches = sum(len(video["false_matches"]) for video in videos)
+    first_times = [video["time_to_first_correct_match"] for video in videos
+                   if video["time_to_first_correct_match"] is not None]
+    ocr_calls = sum(video["ocr_calls"] for video in videos)
+    confirmed = sum(video["confirmed_plates"] for video in videos)
+    return {
+        "recall": round(found / expected, 3) if expected else None,
+        "precision": round(found / (found + false_matches), 3) if found + false_matches else None,
+        "false_matches": false_matches,
+        "mean_time_to_first_correct_match": round(sum(first_times) / len(first_times), 3) if first_times else None,
+        "ocr_calls_per_confirmed_plate": round(ocr_calls / confirmed, 2) if confirmed else None,
+    }
+
+
+def print_report(report):
+    for video in report["videos"]:
+        first = video["time_to_first_correct_match"]
+        print(f"{video['video']}: found {', '.join(video['found']) or '-'}"
+              f"{' missed ' + ', '.join(video['missed']) if video['missed'] else ''}, "
+              f"{len(video['false_matches'])} false, first correct at "
+              f"{f'{first:.2f}s' if first is not None else 'never'}, "
+              f"{video['ocr_calls_per_confirmed_plate']} OCR calls/confirmed plate, {video['fps']} fps")
+    summary = report["summary"]
+    print(f"Recall {summary['recall']}, precision {summary['precision']}, "
+          f"mean time to first correct match {summary['mean_time_to_first_correct_match']}s, "
+          f"{summary['ocr_calls_per_confirmed_plate']} OCR calls/confirmed plate, {report['fps']} fps")
+
+
+def compare_reports(baseline, current):
+    print(f"Compared with {baseline.get('revision') or 'baseline'}:")
+    frames = {video["video"]: video.get("frames") for video in baseline["videos"]}
+    for video in current["videos"]:
+        if video["video"] in frames and frames[video["video"]] != video["frames"]:
+            print(f"  {video['video']}: {frames[video['video']]} -> {video['frames']} frames processed, "
+                  f"accuracy numbers are not comparable")
+    for key in ("recall", "precision", "false_matches", "mean_time_to_first_correct_match",
+                "ocr_calls_per_confirmed_plate"):
+        print(f"  {key:<34} {baseline['summary'][key]} -> {current['summary'][key]}")
+    print(f"  {'fps':<34} {baseline['fps']} -> {current['fps']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_replay_arguments(parser)
+    parser.add_argument('--truth', default=None, help='JSON file mapping each video to the plates in it')
+    args = parser.parse_args()
+
+    sample_plates = load_plates(args.plates)
+    truth = load_truth(args.truth, args.videos, sample_plates)
+    registered = {sanitize_plate(plate) for plate in sample_plates} | set().union(*truth.values())
+    results = run_replay(args, plates=sorted(registered))
+
+    videos = [score_video(result, truth[result["video"]]) for result in results["videos"]]
+    report = {key: results[key] for key in ("revision", "time", "pipeline", "model", "backend", "ocr_mode",
+                                            "motion_gate", "frame_step", "roi")}
+    report.update(fps=results["total"]["fps"], peak_rss_mb=results["total"]["peak_rss_mb"],
+                  registered_plates=len(registered), videos=videos, summary=summarize(videos))
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,19 @@
-import sqlite3
 import os
 os.environ['YOLO_AUTOINSTALL'] = 'false'
 os.environ['YOLO_VERBOSE'] = 'false'
 import cv2
 import threading
-import queue
-import serial
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tkinter import StringVar, messagebox
-from LicensePlateRecognitionSystemRaspi import VehicleLicensePlateSystem
+from database import CREATE_USERS_SQL, get_database
+from parking_slots import create_parking_tables
+from parking_lot import get_parking_lot
+from site_config import default_site_config, load_site_config
+from gate_controller import GateController
+from plate_index import get_plate_index
+from recognition_workers import RecognitionWorkerPool, claim_reported_plate
+from latency_metrics import MetricsExporter, get_metrics
 
 working_dir = os.getcwd()
 DATABASE = working_dir + "/users.db"
@@ -18,10 +22,36 @@ DATABASE = working_dir + "/users.db"
 # serial_port = 'COM4'
 serial_port = '/dev/ttyACM0'     # Serial port for Raspberry Pi 5
 
+license_plate_model_path = 'weights/license_plate_detector.pt'
+# license_plate_model_path = 'weights/license_plate_detector.onnx'      # Exported with docs/export_model.py
+detector_backend = None     # 'ultralytics', 'onnx' or 'openvino'; None = LPR_DETECTOR_BACKEND env or file extension
+
 # video_path_1 = 'video/sample_2.mp4'
 video_path_1 = 0
 video_path_2 = 2
 
+# Region of interest per camera: None for the full frame, (x1, y1, x2, y2), or a polygon [(x, y), ...]
+camera_rois = {
+    1: None,
+    2: None
+}
+
+# Site layout: cameras, sources, bay mapping, ROIs and serial ports (see docs/site_config.example.json).
+# Without this file the settings above are used: camera N watches slot N on serial_port
+site_config_path = working_dir + "/site_config.json"
+
+# 'thread': workers share one InferenceService (one copy of the models);
+# 'process': one spawned process per camera (uses all Pi 5 cores), but each process
+# loads its own detector and EasyOCR reader, so memory grows with every camera
+worker_mode = 'thread'
+
+# Frames per second each camera aims to process; the scheduler backs off (and then lowers
+# the detector resolution) when the measured frame time doesn't fit, see frame_scheduler
+target_fps = 4.0
+# Per-stage latency export (see latency_metrics): None to disable, *.prom for the
+# Prometheus textfile collector, anything else is appended to as JSON lines
+metrics_file = None
+
 class DashboardApp(ttk.Window):
     def __init__(self, theme="flatly"):
         super().__init__(themename=theme)
@@ -30,9 +60,15 @@ class DashboardApp(ttk.Window):
         self.minsize(1000, 800)
 
         # Initialize database connection and ensure tables exist
-        self.conn = sqlite3.connect(DATABASE, check_same_thread=False)
+        self.db = get_database(DATABASE)
+        self.site = load_site_config(site_config_path) if os.path.exists(site_config_path) else \
+            default_site_config({1: video_path_1, 2: video_path_2}, camera_rois, serial_port)
         self.create_table()
         self.create_parking_info_table()
+        # In-memory slot state shared with the recognition threads
+        self.parking_lot = get_parking_lot(DATABASE)
+        if metrics_file:
+            MetricsExporter(metrics_file, fmt='prometheus' if metrics_file.endswith('.prom') else 'jsonl').start()
 
         self.style.configure("TButton", font=("Helvetica", 10, "bold"))
         self.style.configure("Treeview.Heading", font=("Helvetica", 11, "bold"),
@@ -54,35 +90,17 @@ class DashboardApp(ttk.Window):
 
         self.show_frame("MainPage")
 
+    @property
+    def conn(self):
+        # Each thread (Tk mainloop, event listener) gets its own connection
+        return self.db.connection()
+
     def create_table(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                age INTEGER,
-                plate_number TEXT
-            )
-        """)
+        self.conn.execute(CREATE_USERS_SQL)
         self.conn.commit()
 
     def create_parking_info_table(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS parking_info (
-                slot_number INTEGER PRIMARY KEY,
-                slot_status TEXT,
-                plate_number TEXT
-            )
-        """)
-        self.conn.commit()
-        cursor.execute("SELECT COUNT(*) FROM parking_info")
-        count = cursor.fetchone()[0]
-        if count == 0:
-            cursor.execute("INSERT INTO parking_info (slot_number, slot_status, plate_number) VALUES (1, 'empty', '')")
-            cursor.execute("INSERT INTO parking_info (slot_number, slot_status, plate_number) VALUES (2, 'empty', '')")
-            self.conn.commit()
+        create_parking_tables(self.conn, self.site.slots)
 
     def get_all_users(self):
         cursor = self.conn.cursor()
@@ -95,6 +113,12 @@ class DashboardApp(ttk.Window):
         if page_name == "MainPage":
             frame.update_tree()
 
+    def close(self):
+        # After mainloop returns: stop the cameras, save pending parking changes, close the database
+        self.frames["MainPage"].pool.close()
+        self.parking_lot.journal.flush(timeout=2.0)
+        self.db.close_all()
+
 class SideBar(ttk.Frame):
     def __init__(self, parent, container):
         super().__init__(parent, padding=(10, 10))
@@ -124,28 +148,27 @@ class MainPage(ttk.Frame):
     def __init__(self, parent, controller):
         super().__init__(parent, padding=(20, 20))
         self.controller = controller
-        self.recognition_thread1 = None
-        self.recognition_thread2 = None
+        # One recognition worker per configured camera (see recognition_workers)
+        self.pool = RecognitionWorkerPool(
+            self.controller.site.cameras, 'LicensePlateRecognitionSystemRaspi', license_plate_model_path,
+            service_kwargs={'detector_backend': detector_backend}, worker_kwargs={'db_path': 'users.db', 'target_fps': target_fps},
+            mode=worker_mode, preview=True)
         self.create_widgets()
         # Start periodic refresh (every 5000 ms)
         self.refresh_data()
         # create the queue and start listener '/dev/ttyACM0'
-        self.event_queue = queue.Queue()
-        # before starting recognition threads:
-        self.frame_queues = {
-            1: queue.Queue(maxsize=1),
-            2: queue.Queue(maxsize=1)
-        }
+        self.event_queue = self.pool.event_queue
+        # Shared-memory preview rings, one per camera, and the last frame shown from each
+        self.frame_rings = self.pool.frame_rings
+        self.shown_seqs = {camNo: 0 for camNo in self.frame_rings}
         # Track which camera windows are open
-        self.active_cams = {1: True, 2: True}
+        self.active_cams = {camNo: True for camNo in self.controller.site.cameras}
         # Events to tell workers to stop
-        self.stop_events = {1: threading.Event(),
-                            2: threading.Event()}
+        self.stop_events = self.pool.stop_events
         # Kick off display loop
         self.after(30, self._display_frames)
 
-        try: self.serial_port = serial.Serial(serial_port, 9600, timeout=1)
-        except: pass
+        self.gates = GateController(self.controller.site)
         threading.Thread(target=self._process_events, daemon=True).start()
 
     def create_widgets(self):
@@ -208,11 +231,8 @@ class MainPage(ttk.Frame):
     def update_parking_tree(self):
         for item in self.parking_tree.get_children():
             self.parking_tree.delete(item)
-        cursor = self.controller.conn.cursor()
-        cursor.execute("SELECT slot_number, slot_status, plate_number FROM parking_info ORDER BY slot_number ASC")
-        rows = cursor.fetchall()
-        for row in rows:
-            self.parking_tree.insert("", "end", values=row)
+        for slot in self.controller.parking_lot.slots():
+            self.parking_tree.insert("", "end", values=(slot.slot_number, slot.status, slot.plate_number))
 
     def refresh_data(self):
         # Periodically refresh treeviews (e.g., every 5 seconds)
@@ -220,43 +240,17 @@ class MainPage(ttk.Frame):
         self.after(5000, self.refresh_data)
 
     def start_recognition(self):
-        if (self.recognition_thread1 and self.recognition_thread1.is_alive()) or \
-                (self.recognition_thread2 and self.recognition_thread2.is_alive()):
+        if self.pool.is_alive():
             messagebox.showinfo("Info", "License plate recognition is already running.")
             return
 
-        # Clear any previous stop flags
-        self.stop_events[1].clear()
-        self.stop_events[2].clear()
-        self.recognition_thread1 = threading.Thread(target=self.run_worker, args=(1,video_path_1,), daemon=True)
-        self.recognition_thread2 = threading.Thread(target=self.run_worker, args=(2,video_path_2,), daemon=True)
-        self.recognition_thread1.start()
-        self.recognition_thread2.start()
+        for camNo in self.active_cams:
+            self.active_cams[camNo] = True
+            # Workers only render previews while their window is shown
+            self.pool.viewer_events[camNo].set()
+        self.pool.start()
         messagebox.showinfo("Info", "Started license plate recognition.")
 
-    def run_recognition(self, camNo, video_path):
-        system = VehicleLicensePlateSystem(
-            license_plate_model_path='weights/license_plate_detector.pt',
-            db_path='users.db',
-            event_queue = self.event_queue,
-            camera_number=camNo
-        )
-        system.process_video(video_path)
-        # Refresh the parking info after recognition stops
-        self.update_parking_tree()
-
-    def run_worker(self, camNo, video_path):
-        system = VehicleLicensePlateSystem(
-            license_plate_model_path='weights/license_plate_detector.pt',
-            db_path='users.db',
-            event_queue=self.event_queue,
-            camera_number=camNo,
-            frame_queue=self.frame_queues[camNo],  # pass the queue
-            stop_event=self.stop_events[camNo]
-        )
-        system.process_video(video_path)
-        # once done, you could push a sentinel or let the queue drain
-
     def release_slot(self):
         selected_item = self.parking_tree.selection()
         if not selected_item:
@@ -266,44 +260,44 @@ class MainPage(ttk.Frame):
         slot_info = self.parking_tree.item(selected_item, 'values')
         slot_number = slot_info[0]
 
-        cursor = self.controller.conn.cursor()
-        cursor.execute("""
-            UPDATE parking_info 
-            SET slot_status = 'empty', plate_number = '' 
-            WHERE slot_number = ?
-        """, (slot_number,))
-        self.controller.conn.commit()
+        self.controller.parking_lot.release(int(slot_number))
         messagebox.showinfo("Info", f"Slot {slot_number} has been released.")
-        cmd = f"{slot_number}:CLOSE\n".encode()
-        self.serial_port.write(cmd)
+        self.send_gate_command(int(slot_number), "CLOSE")
         self.update_parking_tree()
 
+    def send_gate_command(self, slot_number, state):
+        """Queue N:OPEN / N:CLOSE for the Arduino and gate configured for this bay (see gate_controller)."""
+        self.gates.send(slot_number, state)
+
     def _process_events(self):
         """Listener thread: handle match events from LPR thread."""
         while True:
-            event, cam_no, plate = self.event_queue.get()
+            item = self.event_queue.get()
+            if item[0] == "metrics":
+                # Latency histograms from a process worker
+                get_metrics().merge(item[1], item[2])
+                continue
+            if item[0] == "plate":
+                # Confirmed plate from a process worker; the slot is claimed here
+                item = claim_reported_plate(self.controller.parking_lot, item)
+                if item is None:
+                    continue
+            event, cam_no, plate, slot_number, timing = item
             if event == "match":
-                cursor = self.controller.conn.cursor()
-                # check current status
-                cursor.execute("""
-                    SELECT slot_status 
-                    FROM parking_info 
-                    WHERE slot_number=?
-                    """, (cam_no,))
-                status = cursor.fetchone()[0]
-                # send open command to Arduino
-                cmd = f"{cam_no}:OPEN\n".encode()
-                self.serial_port.write(cmd)
+                # The slot was already claimed in memory by the recognition thread
+                # send open command to the Arduino serving this bay
+                self.gates.open(slot_number, cam_no, timing)
             self.update_parking_tree()
 
     def _display_frames(self):
         still_any = False
         # 1) Show all active camera frames
-        for camNo, q in self.frame_queues.items():
+        for camNo, ring in self.frame_rings.items():
             if not self.active_cams.get(camNo, False):
                 continue
-            if not q.empty():
-                frame = q.get()
+            seq, frame = ring.read_latest(self.shown_seqs[camNo])
+            if frame is not None:
+                self.shown_seqs[camNo] = seq
                 window_name = f"Cam {camNo}: License Plate Recognition"
                 cv2.imshow(window_name, frame)
                 still_any = True
@@ -317,6 +311,7 @@ class MainPage(ttk.Frame):
                     window_name = f"Cam {camNo}: License Plate Recognition"
                     cv2.destroyWindow(window_name)
                     self.active_cams[camNo] = False
+                    self.pool.viewer_events[camNo].clear()
                     self.stop_events[camNo].set()
 
         # 4) Continue looping if any window remains
@@ -389,6 +384,8 @@ class RegisterPage(ttk.Frame):
             VALUES (?, ?, ?, ?)
         """, (first_name, last_name, age_int, plate_number))
         self.controller.conn.commit()
+        # Make the new plate visible to running recognition threads immediately
+        get_plate_index(DATABASE).add(plate_number)
         messagebox.showinfo("Info", "User registered successfully.")
 
         self.first_name_var.set("")
@@ -400,3 +397,4 @@ class RegisterPage(ttk.Frame):
 if __name__ == "__main__":
     app = DashboardApp(theme="darkly")
     app.mainloop()
+    app.close()
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import threading
+
+CREATE_USERS_SQL = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        age INTEGER,
+        plate_number TEXT
+    )
+"""
+
+
+class Database:
+    """Long-lived SQLite connections for users.db, one per thread.
+
+    sqlite3 connections must not be shared across threads without locking,
+    and opening one per query costs a file open, schema parse and lock
+    round trip. Instead every thread (recognition workers, the Tk mainloop,
+    the event listener) lazily gets its own connection, configured once with
+    WAL journaling so readers never block the writer. Each connection keeps
+    sqlite3's prepared statement cache, so repeated queries are not re-parsed.
+    """
+
+    def __init__(self, db_path='users.db', busy_timeout_ms=5000, cached_statements=128):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Open a new configured connection (for callers that need a dedicated one)."""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000,
+                               cached_statements=self.cached_statements, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across application crashes in WAL mode; only an OS
+        # crash or power loss can roll back the last few transactions
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def close_all(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(db_path='users.db'):
+    """Return the process-wide Database for db_path."""
+    key = os.path.abspath(db_path)
+    with _databases_lock:
+        db = _databases.get(key)
+        if db is None:
+            db = Database(db_path)
+            _databases[key] = db
+        return db
@@ -0,0 +1,125 @@
+import os
+os.environ['YOLO_AUTOINSTALL'] = 'false'
+os.environ['YOLO_VERBOSE'] = 'false'
+import cv2
+import numpy as np
+
+# Backend used when none is passed explicitly; can be set per deployment
+# without a code edit, e.g. LPR_DETECTOR_BACKEND=onnx python3 main.py
+DETECTOR_BACKEND_ENV = 'LPR_DETECTOR_BACKEND'
+BACKENDS = ('ultralytics', 'onnx', 'openvino')
+
+
+class PlateBoxes:
+    """Minimal stand-in for ultralytics Boxes: data is an (N, 6) array of x1, y1, x2, y2, score, class_id."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class PlateResults:
+    """Minimal stand-in for ultralytics Results, exposing only .boxes.data."""
+
+    def __init__(self, data):
+        self.boxes = PlateBoxes(data)
+
+
+def letterbox(image, size):
+    """Resize keeping aspect ratio and pad to size x size; returns image, scale and padding."""
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return canvas, scale, pad_x, pad_y
+
+
+class OnnxPlateDetector:
+    """YOLOv8 plate detector running on ONNX Runtime, without importing torch.
+
+    Called like an ultralytics model: detector(frame) or detector([frames])
+    returns a list with one result per frame whose boxes.data holds
+    x1, y1, x2, y2, score, class_id rows in original frame coordinates, so
+    process_video can use it unchanged. providers selects the execution
+    provider, e.g. ['OpenVINOExecutionProvider'] on Intel or the default CPU.
+    imgsz (like ultralytics' predict argument) only takes effect with a
+    dynamic-shape export (dynamic=True); fixed exports always run at their
+    own input size.
+    """
+
+    def __init__(self, model_path, providers=None, conf_threshold=0.25, iou_threshold=0.7, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        available = ort.get_available_providers()
+        providers = [p for p in (providers or ['CPUExecutionProvider']) if p in available] or ['CPUExecutionProvider']
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = model_input.shape[2] if isinstance(model_input.shape[2], int) else 640
+        # Exports with dynamic=True accept a batch dimension and any input size, fixed ones do not
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.dynamic_shape = not isinstance(model_input.shape[2], int)
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    def __call__(self, source, imgsz=None):
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        size = imgsz if imgsz and self.dynamic_shape else self.input_size
+        prepared = [letterbox(frame, size) for frame in frames]
+        blob = np.stack([p[0] for p in prepared])[..., ::-1].transpose(0, 3, 1, 2)
+        blob = np.ascontiguousarray(blob, dtype=np.float32) / 255.0
+        if self.dynamic_batch or len(frames) == 1:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0]
+                                      for i in range(len(frames))])
+        return [self._postprocess(output, *prep[1:]) for output, prep in zip(outputs, prepared)]
+
+    def _postprocess(self, output, scale, pad_x, pad_y):
+        # YOLOv8 head: (4 + num_classes, num_anchors) with cx, cy, w, h first
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_scores)), class_ids]
+        keep = scores >= self.conf_threshold
+        if not keep.any():
+            return PlateResults(np.zeros((0, 6), dtype=np.float32))
+        predictions, scores, class_ids = predictions[keep], scores[keep], class_ids[keep]
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad_x) / scale
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad_y) / scale
+        nms_boxes = np.stack([boxes[:, 0], boxes[:, 1], boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]], axis=1)
+        indices = cv2.dnn.NMSBoxes(nms_boxes.tolist(), scores.tolist(), self.conf_threshold, self.iou_threshold)
+        indices = np.array(indices, dtype=np.int64).reshape(-1)
+        data = np.concatenate([boxes[indices], scores[indices, None], class_ids[indices, None]], axis=1)
+        return PlateResults(data.astype(np.float32))
+
+
+def load_plate_detector(model_path, backend=None, **kwargs):
+    """Build the license plate detector for the configured backend.
+
+    backend is 'ultralytics' (PyTorch .pt, or any format ultralytics can load),
+    'onnx' (ONNX Runtime CPU) or 'openvino' (ONNX Runtime with the OpenVINO
+    execution provider). When not given it comes from LPR_DETECTOR_BACKEND,
+    falling back to 'onnx' for .onnx files and 'ultralytics' otherwise.
+    """
+    backend = backend or os.environ.get(DETECTOR_BACKEND_ENV)
+    if not backend:
+        backend = 'onnx' if model_path.endswith('.onnx') else 'ultralytics'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend {backend!r}, expected one of {BACKENDS}")
+    if backend == 'ultralytics':
+        from ultralytics import YOLO
+        return YOLO(model_path)
+    if not model_path.endswith('.onnx'):
+        model_path = os.path.splitext(model_path)[0] + '.onnx'
+    if backend == 'openvino':
+        kwargs.setdefault('providers', ['OpenVINOExecutionProvider', 'CPUExecutionProvider'])
+    return OnnxPlateDetector(model_path, **kwargs)
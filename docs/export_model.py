@@ -0,0 +1,115 @@
+"""Export the plate detector to ONNX (optionally INT8) and check it against the .pt.
+
+Run from the project root:
+    python -m docs.export_model
+    python -m docs.export_model --int8 --tolerance 0.02
+
+The exported model is validated with docs/validate_model.py on docs/data.yaml,
+and its mAP is compared with the original weights. The ONNX Runtime backend
+used at runtime (detector_backends.OnnxPlateDetector) is also checked box by
+box against the ultralytics model on the validation images.
+"""
+import argparse
+import glob
+import os
+
+import cv2
+import numpy as np
+import yaml
+from ultralytics import YOLO
+
+from detector_backends import OnnxPlateDetector, letterbox
+from docs.validate_model import validate_model
+from plate_tracker import iou_matrix
+
+
+def resolve_val_images(data="docs/data.yaml"):
+    with open(data) as f:
+        config = yaml.safe_load(f)
+    root = config.get("path") or os.path.dirname(os.path.abspath(data))
+    val_dir = config["val"]
+    if not os.path.isabs(val_dir):
+        val_dir = os.path.join(root, val_dir)
+    images = []
+    for pattern in ("*.jpg", "*.jpeg", "*.png"):
+        images.extend(glob.glob(os.path.join(val_dir, pattern)))
+    return sorted(images)
+
+
+def export_onnx(model_path, imgsz=640):
+    return YOLO(model_path).export(format="onnx", imgsz=imgsz, simplify=True)
+
+
+def quantize_int8(onnx_path, images, imgsz=640, max_images=100):
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    import onnxruntime as ort
+
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class ValImageReader(CalibrationDataReader):
+        # Calibrates activation ranges on real validation images
+        def __init__(self):
+            self.images = iter(images[:max_images])
+
+        def get_next(self):
+            path = next(self.images, None)
+            if path is None:
+                return None
+            canvas = letterbox(cv2.imread(path), imgsz)[0]
+            blob = canvas[..., ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+            return {input_name: np.ascontiguousarray(blob)}
+
+    int8_path = os.path.splitext(onnx_path)[0] + "_int8.onnx"
+    quantize_static(onnx_path, int8_path, ValImageReader(), quant_format=QuantFormat.QDQ,
+                    per_channel=True, weight_type=QuantType.QInt8, activation_type=QuantType.QUInt8)
+    return int8_path
+
+
+def compare_backends(model_path, onnx_path, images, max_images=50, iou_threshold=0.5):
+    """Match OnnxPlateDetector boxes to ultralytics boxes; returns (mean IoU, missed, extra)."""
+    reference = YOLO(model_path)
+    candidate = OnnxPlateDetector(onnx_path)
+    ious, missed, extra = [], 0, 0
+    for path in images[:max_images]:
+        image = cv2.imread(path)
+        expected = reference(image)[0].boxes.data.cpu().numpy()
+        actual = candidate(image)[0].boxes.data
+        iou = iou_matrix(expected[:, :4], actual[:, :4])
+        best = iou.max(axis=1) if iou.size else np.zeros(len(expected))
+        ious.extend(best[best >= iou_threshold].tolist())
+        missed += int((best < iou_threshold).sum())
+        extra += max(0, len(actual) - int((best >= iou_threshold).sum()))
+    return (float(np.mean(ious)) if ious else 0.0), missed, extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="weights/license_plate_detector.pt")
+    parser.add_argument("--data", default="docs/data.yaml")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="also write a statically quantized INT8 model")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="allowed mAP50-95 drop")
+    args = parser.parse_args()
+
+    onnx_path = export_onnx(args.model, args.imgsz)
+    exported = [onnx_path]
+    images = resolve_val_images(args.data)
+    if args.int8:
+        exported.append(quantize_int8(onnx_path, images, args.imgsz))
+
+    baseline = validate_model(args.model, args.data, imgsz=args.imgsz).box
+    print(f"{args.model}: mAP50-95 {baseline.map:.4f}, mAP50 {baseline.map50:.4f}")
+    ok = True
+    for path in exported:
+        metrics = validate_model(path, args.data, imgsz=args.imgsz).box
+        drop = baseline.map - metrics.map
+        mean_iou, missed, extra = compare_backends(args.model, path, images)
+        status = "OK" if drop <= args.tolerance else "FAIL"
+        ok = ok and status == "OK"
+        print(f"{path}: mAP50-95 {metrics.map:.4f} (drop {drop:+.4f}), mAP50 {metrics.map50:.4f} [{status}]")
+        print(f"    runtime backend vs .pt: mean box IoU {mean_iou:.3f}, missed {missed}, extra {extra}")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 from ultralytics import YOLO
 
-# Load a model
-# model = YOLO("yolo11n.pt")  # load an official model
-model = YOLO("weights/license_plate_detector.pt")  # load a custom model
-
-# Validate the model
-metrics = model.val(data='docs/data.yaml')  # no arguments needed, dataset and settings remembered
-metrics.box.map  # map50-95
-metrics.box.map50  # map50
-metrics.box.map75  # map75
-metrics.box.maps  # a list contains map50-95 of each category
\ No newline at end of file
+
+def validate_model(model_path="weights/license_plate_detector.pt", data="docs/data.yaml", **kwargs):
+    # Works for the .pt weights and for exported models (.onnx, *_openvino_model/)
+    model = YOLO(model_path, task="detect")
+    return model.val(data=data, **kwargs)
+
+
+if __name__ == "__main__":
+    # Load a model
+    # model = YOLO("yolo11n.pt")  # load an official model
+    # Validate the model
+    metrics = validate_model("weights/license_plate_detector.pt")  # load a custom model
+    metrics.box.map  # map50-95
+    metrics.box.map50  # map50
+    metrics.box.map75  # map75
+    metrics.box.maps  # a list contains map50-95 of each category
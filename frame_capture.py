@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class FrameGrabber:
+    """Drains a cv2.VideoCapture on its own thread into a small ring buffer.
+
+    The recognition loop calls read() to get the newest frame, so a slow
+    inference step never works through a backlog of stale frames. Frames that
+    are overwritten before anyone reads them are counted in dropped_frames.
+
+    Video files are played back at their native frame rate (realtime=True) so
+    they behave like a camera. With block_when_full=True the capture thread
+    waits for the reader instead of dropping, which replays every frame of a
+    file as fast as the consumer can take them (used for offline runs).
+    """
+
+    def __init__(self, source, buffer_size=2, realtime=True, block_when_full=False):
+        self.source = source
+        self.realtime = realtime
+        self.block_when_full = block_when_full
+        self._buffer = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.finished = False
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.read_frames = 0
+        self.source_fps = 0.0
+        # Wall-clock capture time of the frame last returned by read()
+        self.last_frame_time = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+
+    def _run(self):
+        """Capture thread: keep only the newest buffer_size frames."""
+        cap = cv2.VideoCapture(self.source)
+        # Keep the driver-side queue short as well, where the backend allows it
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.source_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        is_file = isinstance(self.source, str)
+        frame_interval = 1.0 / self.source_fps if (is_file and self.realtime and self.source_fps > 0) else 0.0
+        next_frame_time = time.time()
+        try:
+            while cap.isOpened() and not self._stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if frame_interval:
+                    next_frame_time += frame_interval
+                    delay = next_frame_time - time.time()
+                    if delay > 0:
+                        self._stop_event.wait(delay)
+                with self._cond:
+                    if self.block_when_full:
+                        while len(self._buffer) == self._buffer.maxlen and not self._stop_event.is_set():
+                            self._cond.wait(0.1)
+                    elif len(self._buffer) == self._buffer.maxlen:
+                        self.dropped_frames += 1
+                    self._buffer.append((self.captured_frames, frame, time.time()))
+                    self.captured_frames += 1
+                    self._cond.notify_all()
+        finally:
+            cap.release()
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def read(self, timeout=1.0, latest=True):
+        """Return (sequence_number, frame), or (None, None) on timeout / end of stream.
+
+        With latest=True older buffered frames are discarded (and counted as
+        dropped); otherwise frames are returned in capture order.
+        """
+        with self._cond:
+            if not self._buffer and not self.finished:
+                self._cond.wait(timeout)
+            if not self._buffer:
+                return None, None
+            if latest:
+                self.dropped_frames += len(self._buffer) - 1
+                item = self._buffer.pop()
+                self._buffer.clear()
+            else:
+                item = self._buffer.popleft()
+            self.read_frames += 1
+            self._cond.notify_all()
+            seq, frame, self.last_frame_time = item
+            return seq, frame
+
+    def is_done(self):
+        with self._cond:
+            return self.finished and not self._buffer
+
+    def stats(self):
+        return {
+            "captured": self.captured_frames,
+            "read": self.read_frames,
+            "dropped": self.dropped_frames,
+        }
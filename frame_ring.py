@@ -0,0 +1,83 @@
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+class SharedFrameRing:
+    """Ring of preallocated frames in shared memory, one producer and any number of readers.
+
+    The block starts with an int64 header: one sequence number per slot and
+    the sequence of the newest complete frame. write() draws (or resizes)
+    straight into the next slot and publishes it by bumping the sequence
+    numbers, so nothing is pickled or queued. read_latest() returns a NumPy
+    view of the newest frame; the view stays valid until the producer has
+    written slots - 1 more frames, which is_current() can confirm.
+
+    Instances pickle by name, so the same ring can be handed to a spawned
+    worker process; only the creating side unlinks the block in close().
+    """
+
+    def __init__(self, shape, slots=3, dtype=np.uint8, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        header_bytes = 8 * (slots + 1)
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=header_bytes + frame_bytes * slots)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        header = np.ndarray((slots + 1,), dtype=np.int64, buffer=self._shm.buf)
+        self._seqs = header[:slots]     # sequence stored in each slot; -1 while it is being written
+        self._latest = header[slots:]   # newest published sequence (0 = nothing yet)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self._shm.buf, offset=header_bytes)
+        if self._owner:
+            header[:] = 0
+
+    def __reduce__(self):
+        return (SharedFrameRing, (self.shape, self.slots, self.dtype.str, self.name))
+
+    def _slot(self, seq):
+        return (seq - 1) % self.slots
+
+    def write(self, frame, draw=None):
+        """Publish frame, resizing it into the slot when its size differs from the ring's.
+
+        draw(target) may annotate the slot in place before it is published.
+        """
+        seq = int(self._latest[0]) + 1
+        slot = self._slot(seq)
+        self._seqs[slot] = -1
+        target = self._frames[slot]
+        if frame.shape == self.shape:
+            np.copyto(target, frame)
+        else:
+            cv2.resize(frame, (self.shape[1], self.shape[0]), dst=target)
+        if draw:
+            draw(target)
+        self._seqs[slot] = seq
+        self._latest[0] = seq
+        return seq
+
+    def read_latest(self, last_seq=0):
+        """Return (seq, frame view) for the newest frame newer than last_seq, else (None, None)."""
+        seq = int(self._latest[0])
+        if seq <= last_seq:
+            return None, None
+        slot = self._slot(seq)
+        if self._seqs[slot] != seq:
+            return None, None
+        return seq, self._frames[slot]
+
+    def is_current(self, seq):
+        """True while the frame published as seq has not been overwritten."""
+        return self._seqs[self._slot(seq)] == seq
+
+    def close(self):
+        self._seqs = self._latest = self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,147 @@
+import multiprocessing
+import threading
+import time
+
+
+class FrameBudget:
+    """Share of the pipeline's time that the cameras of one process split between them.
+
+    Each camera asks for its share after every processed frame. A camera
+    with active plate tracks weighs active_weight times an idle one, so the
+    car being read gets the frames while empty scenes back off. Together the
+    cameras ask for at most utilization of the available time, leaving the
+    rest for capture, the preview and the dashboard.
+    """
+
+    def __init__(self, utilization=0.85, active_weight=3.0):
+        self.utilization = utilization
+        self.active_weight = active_weight
+        self._weights = {}
+        self._lock = threading.Lock()
+
+    def share(self, camera_number, active):
+        with self._lock:
+            self._weights[camera_number] = self.active_weight if active else 1.0
+            return self.utilization * self._weights[camera_number] / sum(self._weights.values())
+
+    def remove(self, camera_number):
+        with self._lock:
+            self._weights.pop(camera_number, None)
+
+
+class SharedFrameBudget(FrameBudget):
+    """FrameBudget for cameras running in separate worker processes.
+
+    The weights live in a shared array (one entry per camera number, 0.0
+    while a camera isn't running), so process workers split one budget
+    like threads do. Created by RecognitionWorkerPool in process mode and
+    handed to every worker.
+    """
+
+    def __init__(self, camera_numbers, utilization=0.85, active_weight=3.0, context=None):
+        self.utilization = utilization
+        self.active_weight = active_weight
+        self._index = {camera_number: i for i, camera_number in enumerate(sorted(camera_numbers))}
+        self._weights = (context or multiprocessing).Array('d', len(self._index))
+
+    def share(self, camera_number, active):
+        weight = self.active_weight if active else 1.0
+        with self._weights.get_lock():
+            self._weights[self._index[camera_number]] = weight
+            return self.utilization * weight / sum(self._weights)
+
+    def remove(self, camera_number):
+        with self._weights.get_lock():
+            self._weights[self._index[camera_number]] = 0.0
+
+
+class FrameScheduler:
+    """Decides when a camera processes its next frame, and at what detector resolution.
+
+    After every processed frame, frame_done() gets the measured processing
+    time (smoothed into cost) and whether plates are being tracked. The
+    next frame is due after the longest of 1 / target_fps (1 / idle_fps
+    while nothing is tracked) and cost / share, the camera's share of the
+    FrameBudget, capped at max_interval. A slow pipeline therefore samples
+    less often instead of falling behind (the FrameGrabber only keeps the
+    newest frames, so there is never a backlog to work through).
+
+    When the interval is pinned at max_interval, or cost stays above
+    latency_budget, the detector input size (detector_size, the model's
+    imgsz) is scaled down one step of scales; it steps back up once there
+    is room again. Changes are at least settle_frames frames apart.
+    """
+
+    def __init__(self, camera_number=1, target_fps=4.0, idle_fps=None, latency_budget=None, max_interval=2.0,
+                 scales=(1.0, 0.75, 0.5), smoothing=0.2, settle_frames=10, budget=None, detector_size=640):
+        self.camera_number = camera_number
+        self.target_fps = target_fps
+        self.idle_fps = idle_fps
+        self.latency_budget = latency_budget
+        self.max_interval = max_interval
+        self.scales = scales
+        self.smoothing = smoothing
+        self.settle_frames = settle_frames
+        self.budget = budget or get_frame_budget()
+        self.detector_size = detector_size
+        self.cost = None
+        self.interval = 1.0 / target_fps if target_fps else 0.0
+        self.active = False
+        self.scale_index = 0
+        self.scale_changes = 0
+        self._frames_since_change = 0
+        self._next_due = 0.0
+
+    @property
+    def scale(self):
+        return self.scales[self.scale_index]
+
+    @property
+    def imgsz(self):
+        """Detector input size for the current scale, None at full size."""
+        if self.scale >= 1.0:
+            return None
+        # Multiple of the YOLO stride (32 px)
+        return max(32, int(self.detector_size * self.scale) // 32 * 32)
+
+    def delay(self):
+        """Seconds until the next frame is due, 0 when it is due now."""
+        return max(0.0, self._next_due - time.time())
+
+    def frame_done(self, seconds, active=False):
+        """Record one processed frame that took seconds, and schedule the next."""
+        self.cost = seconds if self.cost is None else self.cost + self.smoothing * (seconds - self.cost)
+        self.active = bool(active)
+        fps = self.target_fps if self.active or not self.idle_fps else self.idle_fps
+        wanted = max(1.0 / fps if fps else 0.0, self.cost / self.budget.share(self.camera_number, self.active))
+        self.interval = min(wanted, self.max_interval)
+        self._next_due = time.time() - seconds + self.interval
+        self._adjust_scale(wanted)
+
+    def _adjust_scale(self, wanted):
+        self._frames_since_change += 1
+        if self._frames_since_change < self.settle_frames:
+            return
+        over_budget = self.latency_budget is not None and self.cost > self.latency_budget
+        if (over_budget or wanted > self.max_interval) and self.scale_index < len(self.scales) - 1:
+            self.scale_index += 1
+        elif (self.scale_index > 0 and not over_budget and wanted < self.max_interval / 2
+              and (self.latency_budget is None or self.cost < self.latency_budget / 2)):
+            self.scale_index -= 1
+        else:
+            return
+        self._frames_since_change = 0
+        self.scale_changes += 1
+        print(f"Cam {self.camera_number}: detector input size {self.imgsz or self.detector_size} "
+              f"(frame cost {self.cost * 1000:.0f} ms, interval {self.interval:.2f}s)")
+
+    def close(self):
+        self.budget.remove(self.camera_number)
+
+
+_budget = FrameBudget()
+
+
+def get_frame_budget():
+    """Return the FrameBudget shared by the cameras of this process."""
+    return _budget
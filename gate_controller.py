@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import OrderedDict
+
+import serial
+
+from latency_metrics import LatencyHistogram, record_gate_open
+
+
+class SerialGateWorker:
+    """Owns one Arduino serial port and sends it gate commands from a queue.
+
+    submit() only queues and returns. The worker thread writes one
+    "gate:STATE" line at a time and waits for the sketch's "Received:
+    gate:STATE" echo, retrying up to retries times. Queued commands for the
+    same gate are coalesced (the newest state wins), and a command for the
+    state the gate is already being sent, or last acknowledged, is dropped. A failed write closes the
+    port, and the worker reopens it every reconnect_interval seconds.
+    Round-trip times (write to echo) go into rtt.
+    """
+
+    def __init__(self, name, port, baudrate=9600, ack_timeout=1.0, retries=2, reconnect_interval=2.0,
+                 reset_delay=2.0):
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.reconnect_interval = reconnect_interval
+        self.reset_delay = reset_delay
+        self._serial = None
+        self._pending = OrderedDict()   # gate -> (state, camera_number, timing)
+        self._acked = {}                # gate -> last acknowledged state
+        self._inflight = {}             # gate -> state being written by the worker
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._connect_failed = False
+        self.connects = 0
+        self.sent = 0
+        self.acked = 0
+        self.timeouts = 0
+        self.coalesced = 0
+        self.rtt = LatencyHistogram()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, gate, state, camera_number=None, timing=None):
+        with self._cond:
+            replaced = self._pending.pop(gate, None)
+            # The state the gate ends in once the worker is done, without this command
+            settled = self._inflight.get(gate, self._acked.get(gate))
+            if replaced is not None or settled == state:
+                self.coalesced += 1
+            if replaced is not None and replaced[0] == state and camera_number is None:
+                camera_number, timing = replaced[1:]  # keep the match that asked first
+            if settled != state:
+                self._pending[gate] = (state, camera_number, timing)
+                self._cond.notify()
+
+    def _connect(self):
+        try:
+            self._serial = serial.Serial(self.port, self.baudrate, timeout=0.1)
+        except (serial.SerialException, OSError) as e:
+            if not self._connect_failed:
+                print(f"Could not open serial port {self.name} ({self.port}): {e}, "
+                      f"retrying every {self.reconnect_interval}s")
+            self._connect_failed = True
+            return False
+        self._connect_failed = False
+        self.connects += 1
+        # Opening the port resets most Arduinos; give the sketch time to boot
+        self._stop_event.wait(self.reset_delay)
+        self._serial.reset_input_buffer()
+        with self._cond:
+            self._acked.clear()
+        print(f"Serial port {self.name} ({self.port}) connected")
+        return True
+
+    def _disconnect(self, error):
+        print(f"Serial port {self.name} ({self.port}) lost: {error}")
+        try:
+            self._serial.close()
+        except (serial.SerialException, OSError):
+            pass
+        self._serial = None
+
+    def _wait_ack(self, command):
+        expected = f"Received: {command}"
+        deadline = time.time() + self.ack_timeout
+        while time.time() < deadline:
+            line = self._serial.readline().decode(errors="replace").strip()
+            if line == expected:
+                return time.time()
+        return None
+
+    def _send(self, gate, state, camera_number, timing):
+        """Write one command until it is acknowledged; None when the port was lost."""
+        command = f"{gate}:{state}"
+        for _ in range(1 + self.retries):
+            written_at = time.time()
+            try:
+                self._serial.write((command + "\n").encode())
+                self.sent += 1
+                acked_at = self._wait_ack(command)
+            except (serial.SerialException, OSError) as e:
+                self._disconnect(e)
+                return None
+            if acked_at is not None:
+                self.acked += 1
+                self.rtt.record(acked_at - written_at)
+                with self._cond:
+                    self._acked[gate] = state
+                if state == "OPEN" and camera_number is not None:
+                    record_gate_open(camera_number, timing, written_at, acked_at)
+                return True
+            self.timeouts += 1
+            with self._cond:
+                if gate in self._pending:
+                    return False  # superseded by a newer command, don't retry this one
+        print(f"No acknowledgement for {command} on {self.name} after {1 + self.retries} attempts")
+        return False
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self._serial is None and not self._connect():
+                self._stop_event.wait(self.reconnect_interval)
+                continue
+            with self._cond:
+                while not self._pending and not self._stop_event.is_set():
+                    self._cond.wait(0.5)
+                if self._stop_event.is_set():
+                    break
+                gate, command = self._pending.popitem(last=False)
+                if self._acked.get(gate) == command[0]:
+                    self.coalesced += 1
+                    continue
+                self._inflight[gate] = command[0]
+            sent = self._send(gate, *command)
+            with self._cond:
+                del self._inflight[gate]
+                if sent is None:
+                    # Port lost mid-command: resend after reconnecting unless superseded
+                    if gate not in self._pending:
+                        self._pending[gate] = command
+                        self._pending.move_to_end(gate, last=False)
+        if self._serial is not None:
+            self._serial.close()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {"port": self.port, "connected": self._serial is not None, "reconnects": max(self.connects - 1, 0),
+                "sent": self.sent, "acked": self.acked, "timeouts": self.timeouts, "coalesced": self.coalesced,
+                "pending": pending, "rtt": self.rtt.summary()}
+
+
+class GateController:
+    """Sends N:OPEN / N:CLOSE to the Arduino serving each bay of a site_config.SiteConfig.
+
+    Every serial port is owned by a SerialGateWorker, so open(), close() and
+    send() never block the caller on the serial line.
+    """
+
+    def __init__(self, site, ack_timeout=1.0, retries=2, reconnect_interval=2.0, reset_delay=2.0):
+        self.site = site
+        self.workers = {name: SerialGateWorker(name, port, site.baudrate, ack_timeout, retries,
+                                               reconnect_interval, reset_delay).start()
+                        for name, port in site.serial_ports.items()}
+
+    def send(self, slot_number, state, camera_number=None, timing=None):
+        """Queue a command for the gate of slot_number; False when the slot has no serial port.
+
+        camera_number and timing (from a match event) let the worker record
+        end-to-end latency once the Arduino acknowledges an OPEN.
+        """
+        slot = self.site.slots.get(slot_number)
+        worker = self.workers.get(slot.serial_port) if slot else None
+        if worker is None:
+            print(f"No serial port for slot {slot_number}, {state} not sent")
+            return False
+        worker.submit(slot.gate, state, camera_number, timing)
+        return True
+
+    def open(self, slot_number, camera_number=None, timing=None):
+        return self.send(slot_number, "OPEN", camera_number, timing)
+
+    def close(self, slot_number):
+        return self.send(slot_number, "CLOSE")
+
+    def stats(self):
+        return {name: worker.stats() for name, worker in self.workers.items()}
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.stop()
@@ -0,0 +1,186 @@
+import os
+os.environ['YOLO_AUTOINSTALL'] = 'false'
+os.environ['YOLO_VERBOSE'] = 'false'
+import queue
+import threading
+from concurrent.futures import Future
+from detector_backends import load_plate_detector
+import easyocr
+from plate_ocr import recognize_crops
+
+
+class InferenceService:
+    """One plate detector and one OCR reader shared by every camera worker.
+
+    Workers call detect(frame) from their own threads. Requests are queued and
+    a single service thread groups whatever arrives within batch_window
+    seconds (up to max_batch frames) into one license_plate_detector([...])
+    call per requested imgsz, then hands each worker back the Results for
+    its own frame.
+
+    Plate crops sent to recognize() are batched the same way on a second
+    thread, so plates from several cameras share one recognition call. That
+    only batches the model on a GPU (see plate_ocr.recognize_crops); on CPU
+    the OCR thread takes what is already queued and does not wait
+    batch_window for more. readtext() serializes full EasyOCR passes on the
+    shared reader.
+
+    Cameras feeding the service register with add_producer(); with one (or
+    none) there is nobody to batch with, so neither thread waits.
+    """
+
+    def __init__(self, license_plate_model_path, gpu=False, detect_network='dbnet18', load_text_detector=True, detector_backend=None, max_batch=4, max_ocr_batch=8, batch_window=0.01):
+        self.license_plate_detector = load_plate_detector(license_plate_model_path, detector_backend)
+        # detector=False skips loading the text detection weights; plates are
+        # then read with recognize() only and readtext() is unavailable
+        self.reader = easyocr.Reader(['en'], gpu=gpu, detect_network=detect_network, detector=load_text_detector)
+        self.load_text_detector = load_text_detector
+        self.max_batch = max_batch
+        self.max_ocr_batch = max_ocr_batch
+        self.batch_window = batch_window
+        # EasyOCR recognizes region by region on CPU, so waiting to batch only adds latency
+        self.ocr_batch_window = batch_window if self.reader.device != 'cpu' else 0.0
+        self._requests = queue.Queue()
+        self._ocr_requests = queue.Queue()
+        self._ocr_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._producers = 0
+        self._producers_lock = threading.Lock()
+        self.batches = 0
+        self.frames = 0
+        self.ocr_batches = 0
+        self.ocr_crops = 0
+
+    def start(self):
+        if any(thread.is_alive() for thread in self._threads):
+            return self
+        self._stop_event.clear()
+        self._threads = [threading.Thread(target=self._run, daemon=True),
+                         threading.Thread(target=self._run_ocr, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._requests.put(None)
+        self._ocr_requests.put(None)
+
+    def add_producer(self):
+        with self._producers_lock:
+            self._producers += 1
+
+    def remove_producer(self):
+        with self._producers_lock:
+            self._producers = max(0, self._producers - 1)
+
+    def _window(self, window):
+        # A lone producer has nothing to wait for: its next request follows this result
+        return window if self._producers > 1 else 0.0
+
+    def detect(self, frame, timeout=None, imgsz=None):
+        """Run the plate detector on one frame (at imgsz, default the model's); blocks until its batch completes."""
+        future = Future()
+        self._requests.put((frame, future, imgsz))
+        return future.result(timeout)
+
+    def recognize(self, crops, timeout=None):
+        """OCR a list of plate crops; returns one (text, confidence) per crop."""
+        if not crops:
+            return []
+        future = Future()
+        self._ocr_requests.put((list(crops), future))
+        return future.result(timeout)
+
+    def readtext(self, image, **kwargs):
+        with self._ocr_lock:
+            return self.reader.readtext(image, **kwargs)
+
+    def _next_batch(self, requests, max_batch, window):
+        item = requests.get()
+        if item is None:
+            return []
+        batch = [item]
+        while len(batch) < max_batch:
+            try:
+                item = requests.get(timeout=window)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stop_event.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        """Service thread: batch queued frames into single detector calls."""
+        while not self._stop_event.is_set():
+            batch = self._next_batch(self._requests, self.max_batch, self._window(self.batch_window))
+            # One detector call per input size
+            groups = {}
+            for frame, future, imgsz in batch:
+                groups.setdefault(imgsz, []).append((frame, future))
+            for imgsz, requests in groups.items():
+                frames = [frame for frame, _ in requests]
+                try:
+                    results = self.license_plate_detector(frames, **({'imgsz': imgsz} if imgsz else {}))
+                except Exception as e:
+                    for _, future in requests:
+                        future.set_exception(e)
+                    continue
+                self.batches += 1
+                self.frames += len(frames)
+                for (_, future), result in zip(requests, results):
+                    future.set_result(result)
+        self._fail_pending(self._requests)
+
+    def _run_ocr(self):
+        """OCR thread: recognize crops from all queued requests in one call."""
+        while not self._stop_event.is_set():
+            batch = self._next_batch(self._ocr_requests, self.max_ocr_batch, self._window(self.ocr_batch_window))
+            if not batch:
+                continue
+            crops = [crop for request_crops, _ in batch for crop in request_crops]
+            try:
+                with self._ocr_lock:
+                    readings = recognize_crops(self.reader, crops)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.ocr_batches += 1
+            self.ocr_crops += len(crops)
+            start = 0
+            for request_crops, future in batch:
+                future.set_result(readings[start:start + len(request_crops)])
+                start += len(request_crops)
+        self._fail_pending(self._ocr_requests)
+
+    def _fail_pending(self, requests):
+        # Fail anything still waiting so workers do not hang on shutdown
+        while True:
+            try:
+                item = requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Inference service stopped"))
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_inference_service(license_plate_model_path, **kwargs):
+    """Return the process-wide service for a model path and settings, creating and starting it on first use.
+
+    Callers asking for different settings (gpu, detect_network, ...) get separate services.
+    """
+    key = (os.path.abspath(license_plate_model_path), tuple(sorted(kwargs.items())))
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = InferenceService(license_plate_model_path, **kwargs).start()
+            _services[key] = service
+        return service
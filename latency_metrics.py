@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Log-spaced bucket upper bounds from 0.1 ms to ~10 minutes (25% apart), so
+# any percentile is within one bucket width (+25%) of the true value
+BUCKET_BOUNDS = tuple(0.0001 * 1.25 ** i for i in range(71))
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Stages recorded by the pipelines, in pipeline order
+STAGES = ("capture", "detect", "crop", "ocr", "match", "db", "dispatch", "serial", "end_to_end")
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; recording is one bisect and an increment."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (0 < q <= 1)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self):
+        summary = {f"p{int(q * 100)}": self.percentile(q) for q in QUANTILES}
+        summary.update(count=self.count, mean=self.total / self.count if self.count else 0.0, max=self.max)
+        return summary
+
+    def snapshot(self):
+        return {"counts": list(self.counts), "count": self.count, "sum": self.total, "max": self.max}
+
+    @classmethod
+    def from_snapshot(cls, data):
+        histogram = cls()
+        histogram.counts = list(data["counts"])
+        histogram.count = data["count"]
+        histogram.total = data["sum"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class StageMetrics:
+    """Per-stage latency histograms for one camera (or the site-wide "site" key),
+    plus a few gauges such as the motion gate's hit rate."""
+
+    def __init__(self, key):
+        self.key = key
+        self._stages = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def set_gauges(self, prefix, values):
+        """Store values as prefix_name gauges, e.g. set_gauges("motion_gate", gate.stats())."""
+        with self._lock:
+            for name, value in values.items():
+                self._gauges[f"{prefix}_{name}"] = value
+
+    def histograms(self):
+        with self._lock:
+            return dict(self._stages)
+
+    def gauges(self):
+        with self._lock:
+            return dict(self._gauges)
+
+    def snapshot(self):
+        with self._lock:
+            return {"stages": {stage: histogram.snapshot() for stage, histogram in self._stages.items()},
+                    "gauges": dict(self._gauges)}
+
+    def replace(self, snapshot):
+        """Take over stages and gauges reported by a worker process (its totals since start)."""
+        with self._lock:
+            for stage, data in snapshot["stages"].items():
+                self._stages[stage] = LatencyHistogram.from_snapshot(data)
+            self._gauges.update(snapshot["gauges"])
+
+
+class MetricsRegistry:
+    """All StageMetrics of this process, keyed by camera number."""
+
+    def __init__(self):
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def camera(self, key):
+        with self._lock:
+            metrics = self._cameras.get(key)
+            if metrics is None:
+                metrics = self._cameras[key] = StageMetrics(key)
+            return metrics
+
+    def merge(self, key, snapshot):
+        self.camera(key).replace(snapshot)
+
+    def summary(self):
+        """{camera: {stage: {p50, p90, p99, count, mean, max}}} in seconds."""
+        with self._lock:
+            cameras = dict(self._cameras)
+        return {str(key): {stage: histogram.summary() for stage, histogram in metrics.histograms().items()}
+                for key, metrics in cameras.items()}
+
+    def gauges(self):
+        """{camera: {gauge: value}}, cameras without gauges left out."""
+        with self._lock:
+            cameras = dict(self._cameras)
+        return {str(key): gauges for key, gauges in ((key, metrics.gauges()) for key, metrics in cameras.items())
+                if gauges}
+
+    def prometheus_text(self):
+        lines = ["# HELP lpr_stage_latency_seconds Per-stage latency of the plate recognition pipeline",
+                 "# TYPE lpr_stage_latency_seconds summary"]
+        with self._lock:
+            cameras = dict(self._cameras)
+        for key, metrics in sorted(cameras.items(), key=lambda item: str(item[0])):
+            for stage, histogram in sorted(metrics.histograms().items()):
+                labels = f'camera="{key}",stage="{stage}"'
+                for q in QUANTILES:
+                    lines.append(f'lpr_stage_latency_seconds{{{labels},quantile="{q}"}} {histogram.percentile(q):.6f}')
+                lines.append(f"lpr_stage_latency_seconds_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"lpr_stage_latency_seconds_count{{{labels}}} {histogram.count}")
+        for key, gauges in sorted(self.gauges().items()):
+            for name, value in sorted(gauges.items()):
+                lines.append(f'lpr_{name}{{camera="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    """Return this process's MetricsRegistry."""
+    return _registry
+
+
+def record_gate_open(camera_number, timing, written_at, acked_at):
+    """Record dispatch (event sent -> OPEN written), serial round trip and end-to-end
+    (plate first seen -> Arduino acknowledged OPEN) latency."""
+    metrics = _registry.camera(camera_number)
+    metrics.record("serial", acked_at - written_at)
+    if timing:
+        metrics.record("dispatch", written_at - timing["sent"])
+        metrics.record("end_to_end", acked_at - timing["first_seen"])
+
+
+class MetricsExporter:
+    """Writes the registry every interval seconds.
+
+    fmt='prometheus' rewrites path atomically (for node_exporter's textfile
+    collector); fmt='jsonl' appends one {"time", "latency", "gauges"} line per export.
+    """
+
+    def __init__(self, path, interval=10.0, fmt='prometheus', registry=None):
+        if fmt not in ('prometheus', 'jsonl'):
+            raise ValueError(f"Unknown metrics format {fmt!r}, expected 'prometheus' or 'jsonl'")
+        self.path = path
+        self.interval = interval
+        self.fmt = fmt
+        self.registry = registry or _registry
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def export(self):
+        if self.fmt == 'prometheus':
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(self.registry.prometheus_text())
+            os.replace(tmp_path, self.path)
+        else:
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"time": time.time(), "latency": self.registry.summary(),
+                                    "gauges": self.registry.gauges()}) + "\n")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.export()
+            except OSError as e:
+                print(f"Metrics export to {self.path} failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        self.export()
@@ -1,7 +1,9 @@
-# from old_codes.dashboard_with_sqlite import *         # For test code
-from dashboard.dashboard_for_multicam import *          # For Windows machine
-# from dashboard.dashboard_raspi import *               # For Raspberry Pi machine
-
-if __name__ == "__main__":
-    app = DashboardApp(theme="darkly")
-    app.mainloop()
\ No newline at end of file
+# from old_codes.dashboard_with_sqlite import *         # For test code
+from dashboard.dashboard_for_multicam import *          # For Windows machine
+# from dashboard.dashboard_raspi import *               # For Raspberry Pi machine
+# Without a display: python parking_daemon.py (headless service with an HTTP/WebSocket API)
+
+if __name__ == "__main__":
+    app = DashboardApp(theme="darkly")
+    app.mainloop()
+    app.close()
\ No newline at end of file
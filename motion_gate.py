@@ -0,0 +1,85 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap scene-change check in front of the plate detector.
+
+    Each frame is shrunk to a small grayscale thumbnail and compared with a
+    slowly updated background. The gate opens when more than open_fraction of
+    the thumbnail pixels changed, and only closes again after hold_checks
+    consecutive quiet frames (below close_fraction), so a car that pauses
+    while approaching keeps being processed. While closed, a keep-alive lets
+    one frame through every keepalive_interval seconds.
+    """
+
+    def __init__(self, thumb_width=80, pixel_threshold=18, open_fraction=0.02, close_fraction=0.01,
+                 hold_checks=8, keepalive_interval=5.0, learning_rate=0.05):
+        self.thumb_width = thumb_width
+        self.pixel_threshold = pixel_threshold
+        self.open_fraction = open_fraction
+        self.close_fraction = close_fraction
+        self.hold_checks = hold_checks
+        self.keepalive_interval = keepalive_interval
+        self.learning_rate = learning_rate
+        self._background = None
+        self._quiet_checks = 0
+        self._last_pass = 0.0
+        self.is_open = True
+        self.checks = 0
+        self.passed = 0
+        self.keepalives = 0
+        self.last_changed_fraction = 0.0
+
+    def _thumbnail(self, frame):
+        h, w = frame.shape[:2]
+        thumb_height = max(1, int(h * self.thumb_width / w))
+        thumb = cv2.resize(frame, (self.thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(thumb, (3, 3), 0).astype(np.float32)
+
+    def should_run(self, frame):
+        """Return True when the detector should run on this frame."""
+        self.checks += 1
+        thumb = self._thumbnail(frame)
+        if self._background is None or self._background.shape != thumb.shape:
+            self._background = thumb
+            changed = 1.0
+        else:
+            changed = float(np.count_nonzero(np.abs(thumb - self._background) > self.pixel_threshold)) / thumb.size
+            cv2.accumulateWeighted(thumb, self._background, self.learning_rate)
+        self.last_changed_fraction = changed
+
+        # Hysteresis: open on clear motion, close only after a quiet streak
+        if changed >= self.open_fraction:
+            self.is_open = True
+            self._quiet_checks = 0
+        elif changed < self.close_fraction:
+            self._quiet_checks += 1
+            if self._quiet_checks >= self.hold_checks:
+                self.is_open = False
+
+        now = time.time()
+        run = self.is_open
+        if not run and now - self._last_pass >= self.keepalive_interval:
+            run = True
+            self.keepalives += 1
+        if run:
+            self.passed += 1
+            self._last_pass = now
+        return run
+
+    def hit_rate(self):
+        """Fraction of checked frames that were let through to the detector."""
+        return self.passed / self.checks if self.checks else 0.0
+
+    def stats(self):
+        return {
+            "checked": self.checks,
+            "passed": self.passed,
+            "keepalives": self.keepalives,
+            "hit_rate": self.hit_rate(),
+        }
@@ -0,0 +1,70 @@
+"""Headless entry point: camera workers, slot state and gates behind a local HTTP/WebSocket API.
+
+    python parking_daemon.py --site site_config.json --port 8080
+
+Then open http://127.0.0.1:8080/api/slots, /stream/1.mjpg or connect to
+ws://127.0.0.1:8080/ws (see status_server.StatusRequestHandler).
+"""
+import argparse
+import os
+
+from latency_metrics import MetricsExporter
+from parking_service import ParkingService
+from recognition_workers import PIPELINES
+from site_config import default_site_config, load_site_config
+from status_server import StatusServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--site', default='site_config.json',
+                        help='site configuration (default layout: cameras 0 and 2 on slots 1 and 2)')
+    parser.add_argument('--pipeline', choices=sorted(PIPELINES), default='raspi')
+    parser.add_argument('--model', default='weights/license_plate_detector.pt')
+    parser.add_argument('--backend', default=None, help="'ultralytics', 'onnx' or 'openvino'")
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                        help="'process' runs each camera on its own cores but loads the models once per camera")
+    parser.add_argument('--target-fps', type=float, default=None,
+                        help='frames per second each camera aims to process (raspi default 4, multicam unlimited)')
+    parser.add_argument('--db', default='users.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--metrics-file', default=None,
+                        help='also write per-stage latency here every --metrics-interval seconds')
+    parser.add_argument('--metrics-format', choices=['prometheus', 'jsonl'], default='prometheus')
+    parser.add_argument('--metrics-interval', type=float, default=10.0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.site):
+        site = load_site_config(args.site)
+    else:
+        print(f"{args.site} not found, using the default two-camera layout")
+        site = default_site_config({1: 0, 2: 2}, serial_port='/dev/ttyACM0')
+
+    pipeline, service_kwargs = PIPELINES[args.pipeline]
+    worker_kwargs = {'preview': False} if args.pipeline == 'multicam' else {}
+    if args.target_fps:
+        worker_kwargs['target_fps'] = args.target_fps
+    service = ParkingService(site, pipeline, args.model, db_path=args.db,
+                             service_kwargs=dict(service_kwargs, detector_backend=args.backend),
+                             worker_kwargs=worker_kwargs,
+                             worker_mode=args.mode)
+    server = StatusServer((args.host, args.port), service)
+    service.start()
+    exporter = None
+    if args.metrics_file:
+        exporter = MetricsExporter(args.metrics_file, args.metrics_interval, args.metrics_format).start()
+    print(f"Serving {len(site.cameras)} cameras and {len(site.slots)} slots on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if exporter:
+            exporter.stop()
+
+
+if __name__ == "__main__":
+    main()
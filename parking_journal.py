@@ -0,0 +1,184 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from database import get_database
+from latency_metrics import get_metrics
+
+CREATE_PARKING_EVENTS_SQL = """
+    CREATE TABLE IF NOT EXISTS parking_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event TEXT NOT NULL,
+        plate_number TEXT,
+        camera_number INTEGER,
+        slot_number INTEGER,
+        confidence REAL,
+        result TEXT,
+        created_at REAL NOT NULL
+    )
+"""
+
+INSERT_PARKING_EVENT_SQL = """
+    INSERT INTO parking_events (event, plate_number, camera_number, slot_number, confidence, result, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Slot state decided by parking_lot.ParkingLot, written as-is
+PERSIST_SLOT_SQL = {
+    "occupy": "UPDATE parking_info SET slot_status = 'occupied', plate_number = ? WHERE slot_number = ?",
+    "release": "UPDATE parking_info SET slot_status = 'empty', plate_number = '' WHERE slot_number = ?",
+}
+
+
+class ParkingJournal:
+    """Write-behind persistence for parking state changes.
+
+    parking_lot.ParkingLot decides every claim and release in memory and
+    hands the result to record_occupy() / record_release() / record_match(),
+    which return immediately. A single writer thread drains the bounded
+    queue and applies up to batch_size changes in one transaction (the new
+    slot state on parking_info plus an append-only row in parking_events for
+    each), so fsync is paid once per group instead of once per match.
+
+    A batch that fails to commit is retried up to max_retries times,
+    retry_interval seconds apart (growing with each attempt). Changes that
+    still fail, or that find the queue full for put_timeout, leave
+    parking_info behind the in-memory state; they are counted in failed and
+    dropped, which stats() reports and which go to the "site" metrics as
+    journal_* gauges.
+    """
+
+    def __init__(self, db_path='users.db', max_queue=1000, batch_size=64, flush_interval=0.05, put_timeout=1.0,
+                 max_retries=3, retry_interval=0.5):
+        self.db = get_database(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self.written = 0
+        self.commits = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _put(self, item):
+        try:
+            self._queue.put(item, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"Parking journal full, dropped {item[0]} event for {item[1]}")
+            self._report()
+            return False
+
+    def stats(self):
+        return {"written": self.written, "commits": self.commits, "queued": self._queue.qsize(),
+                "retries": self.retries, "failed": self.failed, "dropped": self.dropped}
+
+    def _report(self):
+        get_metrics().camera("site").set_gauges("journal", self.stats())
+
+    def record_occupy(self, slot_number, plate, camera_number=None, confidence=None):
+        """Queue a slot becoming occupied by plate."""
+        return self._put(("occupy", plate, camera_number, slot_number, confidence, "assigned", time.time()))
+
+    def record_release(self, slot_number, plate=None, camera_number=None):
+        """Queue a slot becoming empty."""
+        return self._put(("release", plate, camera_number, slot_number, None, None, time.time()))
+
+    def record_match(self, plate, camera_number, slot_number=None, confidence=None, result=None):
+        """Queue a history row for a match that did not change any slot."""
+        return self._put(("match", plate, camera_number, slot_number, confidence, result, time.time()))
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been committed."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, conn, batch):
+        with conn:
+            for event, plate, camera_number, slot_number, confidence, result, created_at in batch:
+                if event == "occupy":
+                    conn.execute(PERSIST_SLOT_SQL[event], (plate, slot_number))
+                elif event == "release":
+                    conn.execute(PERSIST_SLOT_SQL[event], (slot_number,))
+                conn.execute(INSERT_PARKING_EVENT_SQL,
+                             (event, plate, camera_number, slot_number, confidence, result, created_at))
+
+    def _run(self):
+        """Writer thread: commit queued parking changes in groups."""
+        conn = self.db.connection()
+        conn.execute(CREATE_PARKING_EVENTS_SQL)
+        conn.commit()
+        while True:
+            batch = self._next_batch()
+            try:
+                self._commit(conn, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            self._report()
+
+    def _commit(self, conn, batch):
+        for attempt in range(1 + self.max_retries):
+            try:
+                self._apply(conn, batch)
+                break
+            except sqlite3.Error as e:
+                if attempt == self.max_retries:
+                    self.failed += len(batch)
+                    print(f"Database error: {e}, {len(batch)} parking changes not saved")
+                    return
+                self.retries += 1
+                print(f"Database error: {e}, retrying")
+                time.sleep(self.retry_interval * (attempt + 1))
+        self.written += len(batch)
+        self.commits += 1
+        committed_at = time.time()
+        metrics = get_metrics()
+        for item in batch:
+            metrics.camera(item[2] if item[2] is not None else "site").record("db", committed_at - item[6])
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_parking_journal(db_path='users.db'):
+    """Return the process-wide journal for db_path, starting its writer on first use."""
+    key = os.path.abspath(db_path)
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = ParkingJournal(db_path).start()
+            _journals[key] = journal
+        return journal
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+from database import get_database
+from parking_journal import get_parking_journal
+from parking_slots import SlotClaim
+
+Slot = namedtuple("Slot", ["slot_number", "status", "plate_number", "since"])
+
+
+class ParkingLot:
+    """Authoritative in-memory parking state, persisted to parking_info in the background.
+
+    Slots are loaded once from the database. Claims and releases are decided
+    here under a small lock and take effect immediately; the parking journal
+    then writes them to parking_info (and parking_events) asynchronously, so
+    a confirmed match never waits on SQLite before the gate can open.
+
+    The state is copy-on-write: every change builds new dicts and swaps them
+    in with one assignment, so readers (dashboard, event listener, workers)
+    never take the lock and always see a consistent snapshot.
+    """
+
+    def __init__(self, db_path='users.db'):
+        self.db = get_database(db_path)
+        self.journal = get_parking_journal(db_path)
+        self._lock = threading.Lock()
+        self._state = ({}, {})  # (slot_number -> Slot, plate -> slot_number)
+        self.reload()
+
+    def reload(self):
+        """Replace the in-memory state with what parking_info currently holds."""
+        rows = self.db.execute("SELECT slot_number, slot_status, plate_number FROM parking_info").fetchall()
+        now = time.time()
+        slots = {}
+        plates = {}
+        for slot_number, status, plate in rows:
+            slots[slot_number] = Slot(slot_number, status, plate or '', now)
+            if status == 'occupied' and plate:
+                plates[plate] = slot_number
+        with self._lock:
+            self._state = (slots, plates)
+
+    def slots(self):
+        """Snapshot of all slots ordered by slot number."""
+        slots = self._state[0]
+        return [slots[n] for n in sorted(slots)]
+
+    def slot(self, slot_number):
+        return self._state[0].get(slot_number)
+
+    def slot_of(self, plate):
+        """Slot the plate is parked in, or None."""
+        return self._state[1].get(plate)
+
+    def claim(self, plate, slot_number=None, camera_number=None, confidence=None):
+        """Occupy a slot with plate and return (SlotClaim, slot_number).
+
+        slot_number is one slot, a list of slots (the lowest free one is
+        taken, e.g. the bays a camera watches) or None for any free slot.
+        """
+        if slot_number is None:
+            candidates = None
+        elif isinstance(slot_number, (list, tuple)):
+            candidates = list(slot_number)
+        else:
+            candidates = [slot_number]
+        with self._lock:
+            slots, plates = self._state
+            parked = plates.get(plate)
+            if parked is not None:
+                if candidates is None or parked in candidates:
+                    result, slot_number = SlotClaim.ALREADY_PARKED, parked
+                else:
+                    result, slot_number = SlotClaim.PARKED_ELSEWHERE, parked
+            else:
+                known = [n for n in (slots if candidates is None else candidates) if n in slots]
+                free = [n for n in known if slots[n].status == 'empty']
+                if free:
+                    result, slot_number = SlotClaim.ASSIGNED, min(free)
+                elif known and candidates is not None:
+                    result, slot_number = SlotClaim.SLOT_OCCUPIED, known[0]
+                else:
+                    result = SlotClaim.NO_SLOT
+                    slot_number = candidates[0] if candidates and len(candidates) == 1 else None
+
+            if result is SlotClaim.ASSIGNED:
+                slots = dict(slots)
+                plates = dict(plates)
+                slots[slot_number] = Slot(slot_number, 'occupied', plate, time.time())
+                plates[plate] = slot_number
+                self._state = (slots, plates)
+
+        if result is SlotClaim.ASSIGNED:
+            self.journal.record_occupy(slot_number, plate, camera_number, confidence)
+        else:
+            self.journal.record_match(plate, camera_number, slot_number, confidence, result.value)
+        return result, slot_number
+
+    def release(self, slot_number, camera_number=None):
+        """Empty a slot; returns the plate that was parked there, or None."""
+        with self._lock:
+            slots, plates = self._state
+            slot = slots.get(slot_number)
+            if slot is None or slot.status == 'empty':
+                return None
+            slots = dict(slots)
+            plates = dict(plates)
+            slots[slot_number] = Slot(slot_number, 'empty', '', time.time())
+            plates.pop(slot.plate_number, None)
+            self._state = (slots, plates)
+        self.journal.record_release(slot_number, slot.plate_number or None, camera_number)
+        return slot.plate_number
+
+
+_lots = {}
+_lots_lock = threading.Lock()
+
+
+def get_parking_lot(db_path='users.db'):
+    """Return the process-wide ParkingLot for db_path, loading it on first use."""
+    key = os.path.abspath(db_path)
+    with _lots_lock:
+        lot = _lots.get(key)
+        if lot is None:
+            lot = ParkingLot(db_path)
+            _lots[key] = lot
+        return lot
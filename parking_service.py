@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from database import CREATE_USERS_SQL, get_database
+from gate_controller import GateController
+from latency_metrics import get_metrics
+from parking_lot import get_parking_lot
+from parking_slots import create_parking_tables
+from recognition_workers import RecognitionWorkerPool, claim_reported_plate
+
+
+class ParkingService:
+    """Camera workers, slot state and gate control for a site, without any GUI.
+
+    Runs a RecognitionWorkerPool, claims slots on the in-memory ParkingLot,
+    opens gates through a GateController and keeps the last few matches.
+    Everything a viewer needs (slots, matches, metrics, preview JPEGs and a
+    live event feed via subscribe()) is served from here, so the Tk
+    dashboard or status_server clients are only readers.
+    """
+
+    def __init__(self, site, pipeline, model_path, db_path='users.db', service_kwargs=None, worker_kwargs=None,
+                 worker_mode='thread', recent_matches=50, jpeg_quality=70):
+        self.site = site
+        self.db = get_database(db_path)
+        self.db.execute(CREATE_USERS_SQL)
+        create_parking_tables(self.db.connection(), site.slots)
+        self.parking_lot = get_parking_lot(db_path)
+        self.gates = GateController(site)
+        self.pool = RecognitionWorkerPool(site.cameras, pipeline, model_path, service_kwargs,
+                                          dict(worker_kwargs or {}, db_path=db_path), mode=worker_mode, preview=True)
+        self.jpeg_quality = jpeg_quality
+        self.recent = deque(maxlen=recent_matches)
+        self.matches = 0
+        self.started_at = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._viewers = {camNo: 0 for camNo in self.pool.frame_rings}
+        self._jpeg_cache = {}   # camNo -> (seq, jpeg bytes)
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self.pool.start()
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.pool.close()
+        self.gates.stop()
+        self.parking_lot.journal.flush(timeout=2.0)
+        self.db.close_all()
+
+    def _dispatch(self):
+        """Event thread: claim reported plates, open gates and notify subscribers."""
+        while True:
+            item = self.pool.event_queue.get()
+            if item[0] == "metrics":
+                get_metrics().merge(item[1], item[2])
+                continue
+            if item[0] == "plate":
+                item = claim_reported_plate(self.parking_lot, item)
+                if item is None:
+                    continue
+            event, camera_number, plate, slot_number, timing = item
+            if event != "match":
+                continue
+            self.gates.open(slot_number, camera_number, timing)
+            match = {"camera_number": camera_number, "plate_number": plate, "slot_number": slot_number,
+                     "time": time.time()}
+            self.recent.appendleft(match)
+            self.matches += 1
+            self.publish(dict(match, type="match"))
+
+    def release(self, slot_number):
+        """Free a slot and close its gate; returns the plate that was parked there."""
+        plate = self.parking_lot.release(slot_number)
+        if plate is not None:
+            self.gates.close(slot_number)
+            self.publish({"type": "release", "slot_number": slot_number, "plate_number": plate, "time": time.time()})
+        return plate
+
+    def slots(self):
+        return [slot._asdict() for slot in self.parking_lot.slots()]
+
+    def recent_matches(self):
+        return list(self.recent)
+
+    def metrics(self):
+        journal = self.parking_lot.journal
+        return {
+            "uptime": time.time() - self.started_at if self.started_at else 0.0,
+            "matches": self.matches,
+            "workers": {camNo: worker.is_alive() for camNo, worker in self.pool.workers.items()},
+            "viewers": dict(self._viewers),
+            "subscribers": len(self._subscribers),
+            "journal": journal.stats(),
+            "gates": self.gates.stats(),
+            "latency": get_metrics().summary(),
+            "gauges": get_metrics().gauges(),
+        }
+
+    def subscribe(self, max_events=100):
+        """Queue that receives every published event until unsubscribe()."""
+        events = queue.Queue(maxsize=max_events)
+        with self._lock:
+            self._subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock:
+            self._subscribers.discard(events)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for events in subscribers:
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                pass  # slow viewer; it catches up from /api/slots
+
+    def add_viewer(self, camNo):
+        # Workers only render previews while at least one viewer is attached
+        with self._lock:
+            self._viewers[camNo] += 1
+            self.pool.viewer_events[camNo].set()
+
+    def remove_viewer(self, camNo):
+        with self._lock:
+            self._viewers[camNo] -= 1
+            if self._viewers[camNo] <= 0:
+                self._viewers[camNo] = 0
+                self.pool.viewer_events[camNo].clear()
+
+    def preview_jpeg(self, camNo, last_seq=0):
+        """Newest preview frame newer than last_seq as (seq, JPEG bytes), encoded once for all viewers."""
+        ring = self.pool.frame_rings[camNo]
+        seq, frame = ring.read_latest(last_seq)
+        if frame is None:
+            return None, None
+        cached = self._jpeg_cache.get(camNo)
+        if cached and cached[0] == seq:
+            return cached
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        # The slot may have been reused while encoding; skip torn frames
+        if not ok or not ring.is_current(seq):
+            return None, None
+        jpeg = jpeg.tobytes()
+        with self._lock:
+            self._jpeg_cache[camNo] = (seq, jpeg)
+        return seq, jpeg
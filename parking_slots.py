@@ -0,0 +1,39 @@
+from enum import Enum
+
+from parking_journal import CREATE_PARKING_EVENTS_SQL
+
+
+class SlotClaim(Enum):
+    """Outcome of parking_lot.ParkingLot.claim()."""
+    ASSIGNED = "assigned"
+    ALREADY_PARKED = "already parked in this slot"
+    PARKED_ELSEWHERE = "already parked in another slot"
+    SLOT_OCCUPIED = "slot occupied by another plate"
+    NO_SLOT = "no such or no free slot"
+
+
+CREATE_PARKING_INFO_SQL = """
+    CREATE TABLE IF NOT EXISTS parking_info (
+        slot_number INTEGER PRIMARY KEY,
+        slot_status TEXT,
+        plate_number TEXT
+    )
+"""
+
+CREATE_PARKING_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_parking_info_plate_status
+    ON parking_info (plate_number, slot_status)
+"""
+
+
+def create_parking_tables(conn, slot_numbers):
+    """Create parking_info (with an empty row per slot), its index and the parking_events history."""
+    with conn:
+        conn.execute(CREATE_PARKING_INFO_SQL)
+        # Covers looking up the slot a plate is parked in
+        conn.execute(CREATE_PARKING_INDEX_SQL)
+        # Append-only history written by the parking journal
+        conn.execute(CREATE_PARKING_EVENTS_SQL)
+        # Every configured bay gets a row; existing rows keep their state
+        conn.executemany("INSERT OR IGNORE INTO parking_info (slot_number, slot_status, plate_number) VALUES (?, 'empty', '')",
+                         [(slot_number,) for slot_number in sorted(slot_numbers)])
@@ -0,0 +1,179 @@
+import os
+import re
+import sqlite3
+import threading
+from database import get_database
+from plate_matcher import PlateMatcher
+
+# Largest match distance the pipelines use by default (max_plate_distance)
+DEFAULT_MAX_DISTANCE = 0.6
+
+# A counter bumped by triggers on every users change, so the watcher can tell
+# users edits apart from parking commits with one cheap read
+USERS_VERSION_SQL = (
+    "CREATE TABLE IF NOT EXISTS users_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO users_version (id, version) VALUES (0, 0)",
+    "CREATE TRIGGER IF NOT EXISTS users_version_insert AFTER INSERT ON users "
+    "BEGIN UPDATE users_version SET version = version + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS users_version_update AFTER UPDATE OF plate_number ON users "
+    "BEGIN UPDATE users_version SET version = version + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS users_version_delete AFTER DELETE ON users "
+    "BEGIN UPDATE users_version SET version = version + 1; END",
+)
+
+
+def sanitize_plate(text):
+    """Normalize a plate string to the form stored in the index (A-Z, 0-9 only)."""
+    return re.sub('[^A-Z0-9]', '', (text or '').upper())
+
+
+class RegisteredPlateIndex:
+    """Thread-safe in-memory set of registered plate numbers.
+
+    Lookups never touch the database. The set is loaded once, extended with
+    add() when a user registers, and reloaded by a background watcher when
+    the users table is changed by another connection. PRAGMA data_version
+    also moves on every parking_info/parking_events commit, so a bump is
+    only followed by a reload when the users_version counter (bumped by
+    triggers on insert, plate edit and delete) changed.
+
+    The matcher index is built for max_distance, the largest distance
+    callers query with; see get_plate_index().
+    """
+
+    def __init__(self, db_path='users.db', poll_interval=2.0, max_distance=DEFAULT_MAX_DISTANCE):
+        self.db_path = db_path
+        self.db = get_database(db_path)
+        self.poll_interval = poll_interval
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._plates = frozenset()
+        self._matcher = PlateMatcher(max_distance=max_distance)
+        self._data_version = None
+        self._users_version = None
+        self._watch_conn = None
+        self._watcher = None
+        self._stop_event = threading.Event()
+        self.reload()
+
+    def __contains__(self, plate):
+        return sanitize_plate(plate) in self._plates
+
+    def __len__(self):
+        return len(self._plates)
+
+    def snapshot(self):
+        # frozenset is immutable, so readers can use it without holding the lock
+        return self._plates
+
+    def best_match(self, plate, max_distance=None):
+        """Closest registered plate within max_distance, or None (see PlateMatcher)."""
+        return self._matcher.best_match(sanitize_plate(plate), max_distance)
+
+    def reload(self):
+        # Take the data_version baseline before reading so a commit that lands
+        # during the load is picked up by the next watcher poll
+        try:
+            self._data_version = self._read_data_version()
+            self._users_version = self._read_users_version()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+        try:
+            rows = self.db.execute("SELECT plate_number FROM users").fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return
+        plates = frozenset(p for p in (sanitize_plate(row[0]) for row in rows if row[0]) if p)
+        if plates == self._plates:
+            return  # e.g. rows registered here and already add()ed; the matcher is up to date
+        matcher = PlateMatcher(plates, max_distance=self.max_distance)
+        with self._lock:
+            self._plates = plates
+            self._matcher = matcher
+
+    def set_max_distance(self, max_distance):
+        """Rebuild the matcher index for a larger query distance."""
+        matcher = PlateMatcher(self._plates, max_distance=max_distance)
+        with self._lock:
+            self.max_distance = max_distance
+            self._matcher = matcher
+
+    def add(self, plate):
+        sanitized_plate = sanitize_plate(plate)
+        if not sanitized_plate:
+            return
+        with self._lock:
+            if sanitized_plate not in self._plates:
+                self._plates = self._plates | {sanitized_plate}
+                self._matcher.add(sanitized_plate)
+
+    def discard(self, plate):
+        sanitized_plate = sanitize_plate(plate)
+        with self._lock:
+            if sanitized_plate in self._plates:
+                self._plates = self._plates - {sanitized_plate}
+                self._matcher.discard(sanitized_plate)
+
+    def start_watcher(self):
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop_event.set()
+
+    def _read_data_version(self):
+        # data_version only changes for commits made by *other* connections,
+        # so the watcher keeps one dedicated connection open for polling
+        if self._watch_conn is None:
+            self._watch_conn = self.db.connect()
+        return self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _read_users_version(self):
+        try:
+            return self._watch_conn.execute("SELECT version FROM users_version WHERE id = 0").fetchone()[0]
+        except sqlite3.OperationalError:
+            pass  # first use of this database: install the counter and its triggers
+        with self._watch_conn:
+            for sql in USERS_VERSION_SQL:
+                self._watch_conn.execute(sql)
+        return self._watch_conn.execute("SELECT version FROM users_version WHERE id = 0").fetchone()[0]
+
+    def _watch(self):
+        """Watcher thread: reload the index when another connection commits."""
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                version = self._read_data_version()
+                if version == self._data_version:
+                    continue
+                self._data_version = version
+                users_version = self._read_users_version()
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                continue
+            if users_version != self._users_version:
+                self.reload()
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_plate_index(db_path='users.db', max_distance=None):
+    """Return the process-wide index for db_path, creating and starting it on first use.
+
+    max_distance is the largest distance the caller will query with; the
+    index is rebuilt when it exceeds what the index was built for.
+    """
+    key = os.path.abspath(db_path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = RegisteredPlateIndex(db_path, max_distance=max_distance or DEFAULT_MAX_DISTANCE)
+            index.start_watcher()
+            _indexes[key] = index
+        elif max_distance is not None and max_distance > index.max_distance:
+            index.set_max_distance(max_distance)
+        return index
@@ -0,0 +1,139 @@
+from collections import namedtuple
+from itertools import combinations
+
+# OCR character confusions, same tables as old_codes/util.py. They are copied
+# here because importing util.py would construct an easyocr.Reader.
+dict_char_to_int = {'O': '0',
+                    'I': '1',
+                    'J': '3',
+                    'A': '4',
+                    'G': '6',
+                    'S': '5'}
+
+dict_int_to_char = {'0': 'O',
+                    '1': 'I',
+                    '3': 'J',
+                    '4': 'A',
+                    '6': 'G',
+                    '5': 'S'}
+
+# Every confusable character maps to one canonical representative, so a plate
+# and its misreads share the same "skeleton" in the index
+CANONICAL_CHARS = dict(dict_char_to_int)
+
+# Result of PlateMatcher.best_match. distance is the weighted edit distance,
+# score is 1.0 for an exact read and falls towards 0.0 as distance grows,
+# ambiguous is True when another registered plate is just as close.
+PlateMatch = namedtuple('PlateMatch', ['plate', 'distance', 'score', 'ambiguous'])
+
+
+def skeleton(plate):
+    return ''.join(CANONICAL_CHARS.get(c, c) for c in plate)
+
+
+def substitution_cost(a, b, confusion_cost):
+    if a == b:
+        return 0.0
+    if CANONICAL_CHARS.get(a, a) == CANONICAL_CHARS.get(b, b):
+        return confusion_cost
+    return 1.0
+
+
+def weighted_edit_distance(a, b, max_distance, confusion_cost=0.3):
+    """Levenshtein distance with cheap OCR-confusion substitutions.
+
+    Returns None as soon as the distance is known to exceed max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = [float(j) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [float(i)] + [0.0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1.0,
+                             current[j - 1] + 1.0,
+                             previous[j - 1] + substitution_cost(a[i - 1], b[j - 1], confusion_cost))
+        if min(current) > max_distance:
+            return None
+        previous = current
+    distance = previous[-1]
+    return distance if distance <= max_distance else None
+
+
+def deletes(word, max_edits):
+    """All strings obtained by deleting up to max_edits characters from word."""
+    variants = {word}
+    for n in range(1, min(max_edits, len(word)) + 1):
+        for positions in combinations(range(len(word)), n):
+            variants.add(''.join(c for i, c in enumerate(word) if i not in positions))
+    return variants
+
+
+class PlateMatcher:
+    """Deletion-neighbourhood index over registered plate skeletons.
+
+    Confusable characters (O/0, I/1, ...) are folded before indexing, so only
+    non-confusion edits count towards the neighbourhood size. With the default
+    max_distance of 1.0 a query touches at most len(plate) + 1 buckets, which
+    keeps lookups well under a millisecond even for 100k registered plates.
+    Buckets are frozensets replaced on write, so readers need no lock.
+    """
+
+    def __init__(self, plates=(), max_distance=1.0, confusion_cost=0.3):
+        self.max_distance = max_distance
+        self.confusion_cost = confusion_cost
+        self.max_edits = int(max_distance)
+        self._buckets = {}
+        self._plates = set()
+        for plate in plates:
+            self.add(plate)
+
+    def __len__(self):
+        return len(self._plates)
+
+    def add(self, plate):
+        if not plate or plate in self._plates:
+            return
+        self._plates.add(plate)
+        for variant in deletes(skeleton(plate), self.max_edits):
+            self._buckets[variant] = self._buckets.get(variant, frozenset()) | {plate}
+
+    def discard(self, plate):
+        if plate not in self._plates:
+            return
+        self._plates.discard(plate)
+        for variant in deletes(skeleton(plate), self.max_edits):
+            bucket = self._buckets.get(variant, frozenset()) - {plate}
+            if bucket:
+                self._buckets[variant] = bucket
+            else:
+                self._buckets.pop(variant, None)
+
+    def candidates(self, plate):
+        found = set()
+        for variant in deletes(skeleton(plate), self.max_edits):
+            bucket = self._buckets.get(variant)
+            if bucket:
+                found |= bucket
+        return found
+
+    def best_match(self, plate, max_distance=None):
+        if max_distance is None:
+            max_distance = self.max_distance
+        # The index only guarantees recall up to the distance it was built for
+        max_distance = min(max_distance, self.max_distance)
+        best = None
+        best_distance = None
+        tied = False
+        for candidate in self.candidates(plate):
+            distance = weighted_edit_distance(plate, candidate, max_distance, self.confusion_cost)
+            if distance is None:
+                continue
+            if best_distance is None or distance < best_distance:
+                best, best_distance, tied = candidate, distance, False
+            elif distance == best_distance:
+                tied = True
+        if best is None:
+            return None
+        score = 1.0 - best_distance / max(len(plate), len(best))
+        return PlateMatch(best, best_distance, score, tied)
@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+# Height every plate crop is scaled to before stacking; EasyOCR's recognizer
+# works on 64 px high lines, so this avoids a second resize inside recognize()
+PLATE_HEIGHT = 64
+# Blank rows between stacked crops so neighbouring plates never bleed together
+STACK_GAP = 8
+
+
+def stack_crops(crops, height=PLATE_HEIGHT, gap=STACK_GAP):
+    """Scale grayscale crops to a common height and stack them on one canvas.
+
+    Returns the canvas and one [x_min, x_max, y_min, y_max] region per crop,
+    in the format EasyOCR's recognize() expects for horizontal_list.
+    """
+    resized = []
+    for crop in crops:
+        h, w = crop.shape[:2]
+        new_w = max(1, int(round(w * height / max(h, 1))))
+        resized.append(cv2.resize(crop, (new_w, height)))
+    width = max(r.shape[1] for r in resized)
+    canvas = np.zeros((len(resized) * (height + gap), width), dtype=np.uint8)
+    regions = []
+    for i, r in enumerate(resized):
+        y = i * (height + gap)
+        canvas[y:y + height, :r.shape[1]] = r
+        regions.append([0, r.shape[1], y, y + height])
+    return canvas, regions
+
+
+def recognize_crops(reader, crops):
+    """Run EasyOCR recognition on all plate crops in a single recognize() call.
+
+    The YOLO plate box already localizes the text, so the crops are passed as
+    known regions and the CRAFT/DBNet text detector is skipped entirely.
+    Returns one (text, confidence) tuple per crop, ("", 0.0) when nothing was
+    read.
+
+    On a GPU the regions go through the recognition model as one batch. On
+    CPU, EasyOCR still runs the model once per region, so the saving there is
+    the skipped text detector and the per-call overhead, not batching.
+    """
+    crops = list(crops)
+    readings = [("", 0.0)] * len(crops)
+    valid = [i for i, c in enumerate(crops) if c is not None and c.size > 0]
+    if not valid:
+        return readings
+    canvas, regions = stack_crops([crops[i] for i in valid])
+    results = reader.recognize(canvas, horizontal_list=regions, free_list=[],
+                               batch_size=len(regions), detail=1)
+    # Map results back through the region's top edge; recognize() returns
+    # them sorted by position, not necessarily in input order
+    row_to_crop = {region[2]: i for i, region in zip(valid, regions)}
+    for box, text, confidence in results:
+        i = row_to_crop.get(int(box[0][1]))
+        if i is not None:
+            readings[i] = (text.strip(), float(confidence))
+    return readings
+
+
+def readtext_reading(results):
+    """Collapse full readtext(detail=1) output into one (text, confidence) tuple.
+
+    The text detector often splits a plate into several boxes ("NBC", "1234"),
+    so the pieces are joined left to right and their confidences averaged.
+    """
+    if not results:
+        return "", 0.0
+    results = sorted(results, key=lambda item: min(point[0] for point in item[0]))
+    text = " ".join(item[1].strip() for item in results).strip()
+    confidence = sum(float(item[2]) for item in results) / len(results)
+    return text, confidence
@@ -0,0 +1,142 @@
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    xx1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    yy1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    xx2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    yy2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def greedy_assignment(iou, iou_threshold):
+    """Match rows to columns by descending IoU; returns a list of (row, col) pairs."""
+    pairs = []
+    if iou.size == 0:
+        return pairs
+    used_rows, used_cols = set(), set()
+    flat_iou = iou.ravel()
+    candidates = np.flatnonzero(flat_iou >= iou_threshold)
+    for flat in candidates[np.argsort(-flat_iou[candidates], kind='stable')]:
+        row, col = divmod(int(flat), iou.shape[1])
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        pairs.append((row, col))
+    return pairs
+
+
+def hungarian_assignment(iou, iou_threshold):
+    if iou.size == 0:
+        return []
+    rows, cols = linear_sum_assignment(-iou)
+    return [(int(r), int(c)) for r, c in zip(rows, cols) if iou[r, c] >= iou_threshold]
+
+
+class PlateTracker:
+    """Assigns stable IDs to license plate boxes across frames.
+
+    Detections are associated to existing tracks with a vectorized IoU matrix
+    and greedy (or, with use_hungarian and SciPy installed, optimal)
+    assignment. With use_kalman, every track carries a constant-velocity
+    Kalman filter over its box corners so a moving plate is matched against
+    its predicted position rather than its last one. Tracks that go unmatched
+    for more than max_age updates are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=15, use_kalman=False, use_hungarian=False):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.use_kalman = use_kalman
+        self.use_hungarian = use_hungarian and linear_sum_assignment is not None
+        self._next_id = 1
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._age = np.zeros(0, dtype=np.int64)
+        # Kalman state per track: x1, y1, x2, y2 and their velocities
+        self._x = np.zeros((0, 8), dtype=np.float32)
+        self._P = np.zeros((0, 8, 8), dtype=np.float32)
+        self._F = np.eye(8, dtype=np.float32)
+        self._F[:4, 4:] = np.eye(4, dtype=np.float32)
+        self._H = np.eye(4, 8, dtype=np.float32)
+        self._Q = np.diag([1, 1, 1, 1, 0.01, 0.01, 0.01, 0.01]).astype(np.float32)
+        self._R = np.eye(4, dtype=np.float32) * 10.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def active_ids(self):
+        return self._ids.tolist()
+
+    def _predict(self):
+        if not self.use_kalman or not len(self._ids):
+            return
+        self._x = self._x @ self._F.T
+        self._P = self._F @ self._P @ self._F.T + self._Q
+
+    def _correct(self, rows, detections):
+        if not self.use_kalman:
+            self._x[rows, :4] = detections
+            return
+        P = self._P[rows]
+        S = self._H @ P @ self._H.T + self._R
+        K = P @ self._H.T @ np.linalg.inv(S)
+        residual = detections - self._x[rows, :4]
+        self._x[rows] += (K @ residual[:, :, None])[:, :, 0]
+        self._P[rows] = (np.eye(8, dtype=np.float32) - K @ self._H) @ P
+
+    def update(self, detections):
+        """Associate this frame's boxes (N, 4+) and return one track ID per box, in order."""
+        if len(detections):
+            detections = np.asarray(detections, dtype=np.float32)[:, :4]
+        else:
+            detections = np.zeros((0, 4), dtype=np.float32)
+        self._predict()
+
+        iou = iou_matrix(detections, self._x[:, :4])
+        if self.use_hungarian:
+            pairs = hungarian_assignment(iou, self.iou_threshold)
+        else:
+            pairs = greedy_assignment(iou, self.iou_threshold)
+
+        track_ids = np.zeros(len(detections), dtype=np.int64)
+        matched_tracks = np.zeros(len(self._ids), dtype=bool)
+        if pairs:
+            det_rows, track_rows = (np.array(index) for index in zip(*pairs))
+            self._correct(track_rows, detections[det_rows])
+            track_ids[det_rows] = self._ids[track_rows]
+            matched_tracks[track_rows] = True
+        self._age[matched_tracks] = 0
+        self._age[~matched_tracks] += 1
+
+        new_rows = np.flatnonzero(track_ids == 0)
+        if len(new_rows):
+            new_ids = np.arange(self._next_id, self._next_id + len(new_rows))
+            self._next_id += len(new_rows)
+            track_ids[new_rows] = new_ids
+            new_x = np.zeros((len(new_rows), 8), dtype=np.float32)
+            new_x[:, :4] = detections[new_rows]
+            new_P = np.tile(np.diag([10, 10, 10, 10, 1000, 1000, 1000, 1000]).astype(np.float32),
+                            (len(new_rows), 1, 1))
+            self._ids = np.concatenate([self._ids, new_ids])
+            self._age = np.concatenate([self._age, np.zeros(len(new_rows), dtype=np.int64)])
+            self._x = np.concatenate([self._x, new_x])
+            self._P = np.concatenate([self._P, new_P])
+
+        alive = self._age <= self.max_age
+        if not alive.all():
+            self._ids, self._age = self._ids[alive], self._age[alive]
+            self._x, self._P = self._x[alive], self._P[alive]
+        return track_ids.tolist()
@@ -0,0 +1,63 @@
+class PlateVoteAggregator:
+    """Accumulates OCR readings per plate track until one plate is confirmed.
+
+    Each reading votes for a plate string with its OCR confidence. A track is
+    confirmed once its leading plate has at least min_votes readings and a
+    summed confidence of min_score. After that, needs_ocr() returns False for
+    the track so the caller can skip EasyOCR until the track leaves the frame.
+    """
+
+    def __init__(self, min_votes=2, min_score=1.2, max_missed_frames=15):
+        self.min_votes = min_votes
+        self.min_score = min_score
+        self.max_missed_frames = max_missed_frames
+        self._votes = {}        # track_id -> {plate: [count, score]}
+        self._confirmed = {}    # track_id -> plate
+        self._confidence = {}   # track_id -> mean OCR confidence of the confirmed plate
+        self._missed = {}       # track_id -> frames since last seen
+        self.ocr_calls = 0
+        self.ocr_skipped = 0
+
+    def needs_ocr(self, track_id):
+        if track_id in self._confirmed:
+            self.ocr_skipped += 1
+            return False
+        return True
+
+    def confirmed_plate(self, track_id):
+        return self._confirmed.get(track_id)
+
+    def confirmed_confidence(self, track_id):
+        return self._confidence.get(track_id)
+
+    def add_reading(self, track_id, plate, confidence):
+        """Record one OCR reading; returns the plate the first time the track is confirmed."""
+        self.ocr_calls += 1
+        self._missed[track_id] = 0
+        if not plate or track_id in self._confirmed:
+            return None
+        votes = self._votes.setdefault(track_id, {})
+        tally = votes.setdefault(plate, [0, 0.0])
+        tally[0] += 1
+        tally[1] += confidence
+        best_plate, (count, score) = max(votes.items(), key=lambda item: item[1][1])
+        if count >= self.min_votes and score >= self.min_score:
+            self._confirmed[track_id] = best_plate
+            self._confidence[track_id] = score / count
+            del self._votes[track_id]
+            return best_plate
+        return None
+
+    def end_frame(self, visible_track_ids):
+        """Forget tracks that have not been seen for max_missed_frames frames."""
+        for track_id in visible_track_ids:
+            self._missed[track_id] = 0
+        for track_id in list(self._missed):
+            if track_id in visible_track_ids:
+                continue
+            self._missed[track_id] += 1
+            if self._missed[track_id] > self.max_missed_frames:
+                del self._missed[track_id]
+                self._votes.pop(track_id, None)
+                self._confirmed.pop(track_id, None)
+                self._confidence.pop(track_id, None)
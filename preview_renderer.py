@@ -0,0 +1,95 @@
+import threading
+import time
+
+import cv2
+
+
+class PreviewRenderer:
+    """Draws the annotated preview on its own thread, only while someone is watching.
+
+    The recognition loop calls submit() with the raw frame and its
+    detections. Nothing is copied or drawn unless a viewer is attached
+    (viewer is a threading/multiprocessing Event, None means always) and
+    at most max_fps frames per second are accepted; the rest return at
+    once. Accepted frames are kept by reference and drawn on the renderer
+    thread, either resized straight into a frame_ring.SharedFrameRing slot
+    or onto one size-sized canvas shown with cv2.imshow in window_name.
+    Pressing q in that window sets closed.
+    """
+
+    def __init__(self, frame_ring=None, window_name=None, viewer=None, max_fps=15.0, size=(800, 600), roi=None):
+        self.frame_ring = frame_ring
+        self.window_name = window_name
+        self.viewer = viewer
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.size = size
+        self.roi = roi
+        self.closed = False
+        self.rendered = 0
+        self._pending = None
+        self._last_submit = 0.0
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def wants_frame(self):
+        if self.closed or (self.viewer is not None and not self.viewer.is_set()):
+            return False
+        return time.time() - self._last_submit >= self.min_interval
+
+    def submit(self, frame, detections, fps=None):
+        """Hand a frame to the renderer; returns False when it was skipped."""
+        if not self.wants_frame():
+            return False
+        self._last_submit = time.time()
+        # The capture thread allocates a new array per frame, so keeping a reference is safe
+        self._pending = (frame, detections, fps)
+        self._ready.set()
+        return True
+
+    def _draw(self, canvas, frame_shape, detections, fps):
+        sx = canvas.shape[1] / frame_shape[1]
+        sy = canvas.shape[0] / frame_shape[0]
+        if self.roi is not None:
+            self.roi.draw(canvas, scale=(sx, sy))
+        for lp, track_id, plate_text in detections:
+            x1, y1, x2, y2 = lp[:4]
+            cv2.rectangle(canvas, (int(x1 * sx), int(y1 * sy)), (int(x2 * sx), int(y2 * sy)), (0, 0, 255), 2)
+            cv2.putText(canvas, plate_text, (int(x1 * sx), int(y1 * sy) - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+        if fps is not None:
+            cv2.putText(canvas, f"FPS: {fps:.2f}", (30, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (50, 255, 0), 2)
+
+    def _render(self, frame, detections, fps):
+        if self.frame_ring is not None:
+            self.frame_ring.write(frame, draw=lambda target: self._draw(target, frame.shape, detections, fps))
+        if self.window_name:
+            canvas = cv2.resize(frame, self.size)
+            self._draw(canvas, frame.shape, detections, fps)
+            cv2.imshow(self.window_name, canvas)
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                self.closed = True
+                cv2.destroyWindow(self.window_name)
+        self.rendered += 1
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if not self._ready.wait(0.5):
+                continue
+            self._ready.clear()
+            pending, self._pending = self._pending, None
+            if pending is not None and not self.closed:
+                self._render(*pending)
+        if self.window_name and not self.closed:
+            cv2.destroyWindow(self.window_name)
+
+    def stop(self):
+        self._stopped.set()
+        self._ready.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
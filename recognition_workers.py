@@ -0,0 +1,162 @@
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+
+import cv2
+
+from frame_ring import SharedFrameRing
+from frame_scheduler import SharedFrameBudget
+from parking_slots import SlotClaim
+
+# Pipeline modules by short name, with the InferenceService kwargs they run with
+PIPELINES = {
+    'raspi': ('LicensePlateRecognitionSystemRaspi', {}),
+    'multicam': ('LicensePlateRecognitionSystemNoVehicleDetection', {'gpu': True, 'detect_network': 'craft'}),
+}
+
+def _limit_threads(num_threads):
+    # Keep each worker process on its share of the cores instead of every
+    # process starting one OpenCV/PyTorch thread per core
+    cv2.setNumThreads(num_threads)
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+
+
+def run_camera_worker(pipeline, camera, model_path, service_kwargs, worker_kwargs, event_queue,
+                      stop_event=None, frame_ring=None, viewer=None, num_threads=None):
+    """Build one camera's VehicleLicensePlateSystem and run it over camera.source.
+
+    pipeline is the module holding the VehicleLicensePlateSystem to use
+    (e.g. 'LicensePlateRecognitionSystemRaspi'). This is the thread target in
+    thread mode and the process entry point in process mode, where every
+    process loads its own models.
+    """
+    if num_threads:
+        _limit_threads(num_threads)
+    from inference_service import get_inference_service
+    module = importlib.import_module(pipeline)
+    kwargs = dict(worker_kwargs)
+    if stop_event is not None:
+        kwargs['stop_event'] = stop_event
+    if frame_ring is not None:
+        kwargs['frame_ring'] = frame_ring
+        kwargs['viewer'] = viewer
+    system = module.VehicleLicensePlateSystem(
+        license_plate_model_path=model_path,
+        event_queue=event_queue,
+        camera_number=camera.camera_number,
+        roi=camera.roi,
+        slots=camera.slots,
+        inference_service=get_inference_service(model_path, **service_kwargs),
+        **kwargs
+    )
+    system.process_video(camera.source)
+
+
+def claim_reported_plate(parking_lot, event):
+    """Claim a slot for a ("plate", camera, plate, slots, confidence, timing) event from a process worker.
+
+    Returns the ("match", camera, plate, slot_number, timing) event the
+    dashboard acts on, or None when no slot was assigned.
+    """
+    _, camera_number, plate, slots, confidence, timing = event
+    result, slot_number = parking_lot.claim(plate, slots, camera_number, confidence)
+    print(f"Cam {camera_number}: plate {plate} slot {slot_number}: {result.value}")
+    if result is SlotClaim.ASSIGNED:
+        return ("match", camera_number, plate, slot_number, timing)
+    return None
+
+
+class RecognitionWorkerPool:
+    """One recognition worker per configured camera, as threads or processes.
+
+    Thread mode shares one InferenceService and the in-memory ParkingLot
+    with the dashboard. Process mode starts a spawned process per camera so
+    pre/post-processing, tracking and annotation run on separate cores
+    instead of contending for one GIL with Tk, at the cost of one copy of
+    the detector and EasyOCR reader per process. Workers then only send
+    compact events: ("plate", camera, plate, slots, confidence, timing) which the
+    dashboard turns into slot claims with claim_reported_plate().
+
+    The pool owns event_queue, stop_events and (with preview=True) one
+    SharedFrameRing of preview_shape frames per camera in frame_rings, so
+    preview frames reach the dashboard without pickling in either mode.
+    Workers only draw into a ring while its viewer_events entry is set.
+    In process mode the workers split one SharedFrameBudget, so cameras
+    with active plate tracks get the frames as they do in thread mode.
+    """
+
+    def __init__(self, cameras, pipeline, model_path, service_kwargs=None, worker_kwargs=None,
+                 mode='thread', preview=False, preview_shape=(600, 800, 3)):
+        self.cameras = dict(cameras)
+        self.pipeline = pipeline
+        self.model_path = model_path
+        self.service_kwargs = dict(service_kwargs or {})
+        self.worker_kwargs = dict(worker_kwargs or {})
+        self.mode = mode
+        if mode == 'process':
+            # spawn: never fork a process that holds Tk, CUDA or open cameras
+            self._context = multiprocessing.get_context('spawn')
+            self.event_queue = self._context.Queue()
+            make_event = self._context.Event
+        elif mode == 'thread':
+            self._context = None
+            self.event_queue = queue.Queue()
+            make_event = threading.Event
+        else:
+            raise ValueError(f"Unknown worker mode {mode!r}, expected 'thread' or 'process'")
+        self.stop_events = {camNo: make_event() for camNo in self.cameras}
+        self.frame_rings = {camNo: SharedFrameRing(preview_shape) for camNo in self.cameras} if preview else {}
+        self.viewer_events = {camNo: make_event() for camNo in self.frame_rings}
+        self.frame_budget = SharedFrameBudget(self.cameras, context=self._context) if mode == 'process' else None
+        self.workers = {}
+
+    def _worker_args(self, camera):
+        worker_kwargs = dict(self.worker_kwargs)
+        num_threads = None
+        if self.mode == 'process':
+            worker_kwargs['claim_slots'] = False
+            worker_kwargs['frame_budget'] = self.frame_budget
+            num_threads = max(1, (os.cpu_count() or 1) // max(1, len(self.cameras)))
+        return (self.pipeline, camera, self.model_path, self.service_kwargs, worker_kwargs, self.event_queue,
+                self.stop_events[camera.camera_number], self.frame_rings.get(camera.camera_number),
+                self.viewer_events.get(camera.camera_number), num_threads)
+
+    def start(self):
+        for camera in self.cameras.values():
+            camNo = camera.camera_number
+            if camNo in self.workers and self.workers[camNo].is_alive():
+                continue
+            self.stop_events[camNo].clear()
+            if self.mode == 'process':
+                worker = self._context.Process(target=run_camera_worker, args=self._worker_args(camera),
+                                               name=f"lpr-cam-{camNo}", daemon=True)
+            else:
+                worker = threading.Thread(target=run_camera_worker, args=self._worker_args(camera),
+                                          name=f"lpr-cam-{camNo}", daemon=True)
+            self.workers[camNo] = worker
+            worker.start()
+        return self
+
+    def is_alive(self):
+        return any(worker.is_alive() for worker in self.workers.values())
+
+    def stop(self, timeout=5.0):
+        for stop_event in self.stop_events.values():
+            stop_event.set()
+        for worker in self.workers.values():
+            worker.join(timeout)
+            if self.mode == 'process' and worker.is_alive():
+                worker.terminate()
+
+    def close(self):
+        """Stop the workers and release the shared preview memory."""
+        self.stop()
+        for ring in self.frame_rings.values():
+            ring.close()
+        self.frame_rings = {}
@@ -0,0 +1,246 @@
+"""Offline replay benchmark: every frame of the sample videos through the recognition pipeline.
+
+    python replay_benchmark.py --output bench.json
+    python replay_benchmark.py --backend onnx --model weights/license_plate_detector.onnx --compare bench.json
+
+Frames are read as fast as the pipeline takes them (no realtime pacing, no
+dropped frames), with no preview and no serial port, against a throwaway
+database holding the sample plates. Results are written as JSON so runs on
+different commits or backends can be compared with --compare. The stub
+database has a slot for every registered plate and each video may claim
+any of them, so every plate read in a video can produce a match.
+"""
+import argparse
+import importlib
+import json
+import os
+import queue
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from database import CREATE_USERS_SQL, get_database
+from frame_capture import FrameGrabber
+from inference_service import get_inference_service
+from latency_metrics import STAGES, get_metrics
+from parking_slots import create_parking_tables
+from recognition_workers import PIPELINES
+
+DEFAULT_VIDEOS = ['video/sample_2.mp4', 'video/sample_3.mp4', 'video/sample_4.mp4', 'video/sample_5.mp4']
+DEFAULT_PLATES = 'dashboard/license_plates_sample.txt'
+BENCH_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def load_plates(path):
+    """One plate per line, optionally quoted: 'NBC 1234'."""
+    with open(path) as f:
+        return [line.strip().strip("'\"") for line in f if line.strip()]
+
+
+def create_stub_database(db_path, plates, slot_numbers):
+    db = get_database(db_path)
+    db.execute(CREATE_USERS_SQL)
+    create_parking_tables(db.connection(), slot_numbers)
+    with db.connection() as conn:
+        conn.executemany("INSERT INTO users (first_name, last_name, age, plate_number) VALUES ('Bench', 'User', 0, ?)",
+                         [(plate,) for plate in plates])
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def stage_percentiles(camera_number):
+    """{stage: {p50, p95, p99, count, mean}} in milliseconds for one replayed video."""
+    histograms = get_metrics().camera(camera_number).histograms()
+    stages = {}
+    for stage in STAGES + ("frame",):
+        histogram = histograms.get(stage)
+        if histogram is None or not histogram.count:
+            continue
+        stages[stage] = {f"p{int(q * 100)}": round(histogram.percentile(q) * 1000, 3) for q in BENCH_QUANTILES}
+        stages[stage].update(count=histogram.count, mean=round(histogram.total / histogram.count * 1000, 3))
+    return stages
+
+
+def replay_video(module, video_path, camera_number, model_path, db_path, service_kwargs, system_kwargs,
+                 frame_step=1):
+    events = queue.Queue()
+    system = module.VehicleLicensePlateSystem(
+        license_plate_model_path=model_path,
+        db_path=db_path,
+        event_queue=events,
+        camera_number=camera_number,
+        inference_service=get_inference_service(model_path, **service_kwargs),
+        **system_kwargs
+    )
+    metrics = get_metrics().camera(camera_number)
+    grabber = FrameGrabber(video_path, realtime=False, block_when_full=True).start()
+    frames = 0
+    skipped = 0
+    matches = []
+    started = time.perf_counter()
+    while True:
+        # In capture order: the grabber waits for us, so no frame is dropped
+        frame_number, frame = grabber.read(timeout=1.0, latest=False)
+        if frame is None:
+            if grabber.is_done():
+                break
+            continue
+        if frame_number % frame_step:
+            skipped += 1
+            continue
+        frame_started = time.perf_counter()
+        system.process_frame(frame, grabber.last_frame_time)
+        metrics.record("frame", time.perf_counter() - frame_started)
+        frames += 1
+        while not events.empty():
+            event = events.get()
+            if event[0] == "match":
+                # video_time: position in the file, i.e. how long the plate had been visible to a live camera
+                matches.append({"plate_number": event[2], "slot_number": event[3], "frame": frame_number,
+                                "video_time": round(frame_number / grabber.source_fps, 3) if grabber.source_fps else None,
+                                "replay_time": round(time.perf_counter() - started, 3)})
+    elapsed = time.perf_counter() - started
+    grabber.stop()
+    if frames + skipped != grabber.captured_frames:
+        raise RuntimeError(f"{video_path}: {grabber.captured_frames} frames captured but {frames} processed "
+                           f"and {skipped} skipped")
+    system.parking_lot.journal.flush(timeout=5.0)
+    motion_gate = system.motion_gate
+    return {
+        "video": video_path,
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+        "ocr_calls_per_frame": round((system.ocr_reads + system.ocr_fallbacks) / frames, 3) if frames else 0.0,
+        "ocr_reads": system.ocr_reads,
+        "ocr_fallbacks": system.ocr_fallbacks,
+        "confirmed_plates": system.confirmed_plates,
+        "motion_gate_hit_rate": round(motion_gate.hit_rate(), 3) if motion_gate else None,
+        "matches": matches,
+        "stages_ms": stage_percentiles(camera_number),
+    }
+
+
+def compare_results(baseline, current):
+    """Print fps and p95 changes per video against an earlier result file."""
+    previous = {video["video"]: video for video in baseline["videos"]}
+    print(f"Compared with {baseline.get('revision') or 'baseline'}:")
+    for video in current["videos"]:
+        before = previous.get(video["video"])
+        if before is None:
+            continue
+        change = (video["fps"] - before["fps"]) / before["fps"] * 100 if before["fps"] else 0.0
+        print(f"  {video['video']}: {before['fps']} -> {video['fps']} fps ({change:+.1f}%), "
+              f"matches {len(before['matches'])} -> {len(video['matches'])}")
+        for stage, summary in video["stages_ms"].items():
+            if stage in before["stages_ms"]:
+                print(f"    {stage:<10} p95 {before['stages_ms'][stage]['p95']:>9.3f} -> {summary['p95']:>9.3f} ms")
+
+
+def add_replay_arguments(parser):
+    parser.add_argument('videos', nargs='*', default=DEFAULT_VIDEOS)
+    parser.add_argument('--pipeline', choices=sorted(PIPELINES), default='raspi')
+    parser.add_argument('--model', default='weights/license_plate_detector.pt')
+    parser.add_argument('--backend', default=None, help="'ultralytics', 'onnx' or 'openvino'")
+    parser.add_argument('--gpu', action='store_true', help='run EasyOCR on the GPU (multicam defaults to it)')
+    parser.add_argument('--ocr-mode', choices=['recognize', 'readtext'], default='recognize')
+    parser.add_argument('--no-motion-gate', action='store_true', help='run the detector on every frame')
+    parser.add_argument('--frame-step', type=int, default=1, help='process every Nth frame only')
+    parser.add_argument('--roi', default=None, help='detection region x1,y1,x2,y2 for every video')
+    parser.add_argument('--plates', default=DEFAULT_PLATES, help='registered plates for the stub database')
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    parser.add_argument('--compare', default=None, help='earlier result file to compare against')
+
+
+def run_replay(args, plates=None):
+    """Replay args.videos and return the results dict (see add_replay_arguments).
+
+    plates overrides the registered plates read from args.plates.
+    """
+    pipeline, service_kwargs = PIPELINES[args.pipeline]
+    service_kwargs = dict(service_kwargs, detector_backend=args.backend)
+    if args.gpu:
+        service_kwargs['gpu'] = True
+    system_kwargs = {'ocr_mode': args.ocr_mode, 'motion_gate': not args.no_motion_gate}
+    if args.roi:
+        system_kwargs['roi'] = tuple(int(v) for v in args.roi.split(','))
+    if args.pipeline == 'multicam':
+        system_kwargs['preview'] = False
+    module = importlib.import_module(pipeline)
+
+    load_started = time.perf_counter()
+    get_inference_service(args.model, **service_kwargs)
+    model_load = time.perf_counter() - load_started
+
+    plates = plates if plates is not None else load_plates(args.plates)
+    # One slot per registered plate, so free slots never cap the matches of a video
+    slot_numbers = list(range(1, len(plates) + 1))
+    tmp_dir = tempfile.mkdtemp(prefix='lpr_bench_')
+    results = {
+        "revision": git_revision(),
+        "time": time.time(),
+        "pipeline": args.pipeline,
+        "model": args.model,
+        "backend": args.backend,
+        "ocr_mode": args.ocr_mode,
+        "motion_gate": not args.no_motion_gate,
+        "frame_step": args.frame_step,
+        "roi": args.roi,
+        "model_load_seconds": round(model_load, 3),
+        "videos": [],
+    }
+    try:
+        for camera_number, video_path in enumerate(args.videos, start=1):
+            # A fresh database per video so every replay starts with empty slots
+            db_path = os.path.join(tmp_dir, f"bench_{camera_number}.db")
+            create_stub_database(db_path, plates, slot_numbers)
+            result = replay_video(module, video_path, camera_number, args.model, db_path, service_kwargs,
+                                  dict(system_kwargs, slots=slot_numbers), args.frame_step)
+            results["videos"].append(result)
+            print(f"{video_path}: {result['frames']} frames in {result['seconds']}s ({result['fps']} fps), "
+                  f"{result['ocr_calls_per_frame']} OCR calls/frame, {len(result['matches'])} matches")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    frames = sum(video["frames"] for video in results["videos"])
+    seconds = sum(video["seconds"] for video in results["videos"])
+    results["total"] = {"frames": frames, "seconds": round(seconds, 3),
+                        "fps": round(frames / seconds, 2) if seconds else 0.0,
+                        "peak_rss_mb": round(peak_rss_mb(), 1)}
+    # ru_maxrss only grows, so peak RSS is reported for the whole run
+    print(f"Total: {frames} frames, {results['total']['fps']} fps, peak RSS {results['total']['peak_rss_mb']} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_replay_arguments(parser)
+    args = parser.parse_args()
+
+    results = run_replay(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
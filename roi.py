@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+
+class RegionOfInterest:
+    """Per-camera detection region: a rectangle (x1, y1, x2, y2) or a polygon [(x, y), ...].
+
+    prepare() crops the frame to the region's bounding box and, when that is
+    larger than the detector input, downscales it so the long side matches
+    input_size. to_frame() maps detections on that image back to full-frame
+    coordinates and, for polygons, drops boxes whose centre lies outside.
+    """
+
+    def __init__(self, region, input_size=640):
+        points = np.asarray(region, dtype=np.float32)
+        if points.ndim == 1:
+            x1, y1, x2, y2 = points
+            points = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)
+            self.is_polygon = False
+        else:
+            self.is_polygon = True
+        self.polygon = points
+        self.input_size = input_size
+        self.x1, self.y1 = (int(v) for v in np.floor(points.min(axis=0)))
+        self.x2, self.y2 = (int(v) for v in np.ceil(points.max(axis=0)))
+        # Set by prepare() for the frame being processed
+        self.scale = 1.0
+        self._offset = (0, 0)
+
+    def prepare(self, frame):
+        h, w = frame.shape[:2]
+        x1, y1 = max(self.x1, 0), max(self.y1, 0)
+        x2, y2 = min(self.x2, w), min(self.y2, h)
+        self._offset = (x1, y1)
+        crop = frame[y1:y2, x1:x2]
+        long_side = max(crop.shape[:2])
+        if long_side > self.input_size:
+            self.scale = self.input_size / long_side
+            crop = cv2.resize(crop, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        else:
+            self.scale = 1.0
+        return crop
+
+    def to_frame(self, detections):
+        off_x, off_y = self._offset
+        mapped = []
+        for x1, y1, x2, y2, score, class_id in detections:
+            box = [x1 / self.scale + off_x, y1 / self.scale + off_y,
+                   x2 / self.scale + off_x, y2 / self.scale + off_y]
+            if self.is_polygon:
+                centre = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+                if cv2.pointPolygonTest(self.polygon, centre, False) < 0:
+                    continue
+            mapped.append(box + [score, class_id])
+        return mapped
+
+    def draw(self, frame, color=(255, 255, 0), scale=(1.0, 1.0)):
+        """Outline the region on frame; scale (sx, sy) maps full-frame to frame coordinates."""
+        polygon = self.polygon * np.array(scale, dtype=np.float32)
+        cv2.polylines(frame, [polygon.astype(np.int32)], True, color, 2)
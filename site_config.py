@@ -0,0 +1,64 @@
+import json
+from collections import namedtuple
+
+# One entry per camera: where frames come from and which bays it watches
+CameraConfig = namedtuple("CameraConfig", ["camera_number", "source", "slots", "roi"])
+# One entry per bay: the Arduino (serial port name) and gate index that serve it
+SlotConfig = namedtuple("SlotConfig", ["slot_number", "serial_port", "gate"])
+SiteConfig = namedtuple("SiteConfig", ["cameras", "slots", "serial_ports", "baudrate"])
+
+
+def _roi(value):
+    # JSON has no tuples; keep rectangles as a flat tuple and polygons as a list of points
+    if value is None:
+        return None
+    if value and isinstance(value[0], (list, tuple)):
+        return [tuple(point) for point in value]
+    return tuple(value)
+
+
+def parse_site_config(data):
+    """Build a SiteConfig from a dict shaped like docs/site_config.example.json."""
+    serial_ports = dict(data.get("serial_ports") or {})
+    default_port = next(iter(serial_ports), None)
+
+    slots = {}
+    for entry in data.get("slots", []):
+        if isinstance(entry, int):
+            entry = {"slot_number": entry}
+        slot_number = int(entry["slot_number"])
+        slots[slot_number] = SlotConfig(slot_number, entry.get("serial_port", default_port),
+                                        int(entry.get("gate", slot_number)))
+
+    cameras = {}
+    for entry in data.get("cameras", []):
+        camera_number = int(entry["camera_number"])
+        camera_slots = [int(n) for n in entry.get("slots", [camera_number])]
+        for slot_number in camera_slots:
+            # Bays only mentioned by a camera get the default port and gate
+            slots.setdefault(slot_number, SlotConfig(slot_number, default_port, slot_number))
+        cameras[camera_number] = CameraConfig(camera_number, entry.get("source", camera_number - 1),
+                                              camera_slots, _roi(entry.get("roi")))
+
+    for slot in slots.values():
+        if slot.serial_port is not None and slot.serial_port not in serial_ports:
+            raise ValueError(f"Slot {slot.slot_number} uses unknown serial port {slot.serial_port!r}")
+    return SiteConfig(cameras, slots, serial_ports, int(data.get("baudrate", 9600)))
+
+
+def load_site_config(path):
+    with open(path) as f:
+        return parse_site_config(json.load(f))
+
+
+def default_site_config(sources, rois=None, serial_port=None, baudrate=9600):
+    """One camera per bay, camera N watching slot N; the layout the dashboards used to hard-code."""
+    rois = rois or {}
+    data = {
+        "serial_ports": {"main": serial_port} if serial_port else {},
+        "baudrate": baudrate,
+        "cameras": [{"camera_number": camera_number, "source": source, "slots": [camera_number],
+                     "roi": rois.get(camera_number)}
+                    for camera_number, source in sorted(sources.items())],
+    }
+    return parse_site_config(data)
@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import json
+import queue
+import re
+import struct
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from latency_metrics import get_metrics
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def websocket_frame(payload, opcode=0x1):
+    """Encode one unmasked, unfragmented server-to-client WebSocket frame."""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 1 << 16:
+        header += bytes([126]) + struct.pack("!H", length)
+    else:
+        header += bytes([127]) + struct.pack("!Q", length)
+    return header + payload
+
+
+class StatusRequestHandler(BaseHTTPRequestHandler):
+    """Routes for a parking_service.ParkingService (self.server.service).
+
+    GET  /api/slots                  slot states
+    GET  /api/matches                most recent matches, newest first
+    GET  /api/metrics                service counters and per-stage latency
+    GET  /metrics                    per-stage latency in Prometheus text format
+    POST /api/slots/<n>/release      free slot n and close its gate
+    GET  /stream/<camera>.mjpg       MJPEG preview of one camera
+    GET  /ws                         WebSocket feed of match/release events
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # one line per poll would drown the recognition output
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.split("?", 1)[0]
+        if path == "/api/slots":
+            self._send_json(service.slots())
+        elif path == "/api/matches":
+            self._send_json(service.recent_matches())
+        elif path == "/api/metrics":
+            self._send_json(service.metrics())
+        elif path == "/metrics":
+            body = get_metrics().prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/ws":
+            self._websocket()
+        else:
+            stream = re.fullmatch(r"/stream/(\d+)\.mjpg", path)
+            if stream and int(stream.group(1)) in service.pool.frame_rings:
+                self._mjpeg(int(stream.group(1)))
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        # Consume the body, or it would be parsed as the next keep-alive request
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        release = re.fullmatch(r"/api/slots/(\d+)/release", self.path)
+        if not release:
+            self._send_json({"error": "not found"}, 404)
+            return
+        slot_number = int(release.group(1))
+        plate = self.server.service.release(slot_number)
+        self._send_json({"slot_number": slot_number, "released": plate is not None, "plate_number": plate})
+
+    def _mjpeg(self, camNo):
+        service = self.server.service
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        service.add_viewer(camNo)
+        last_seq = 0
+        try:
+            while True:
+                seq, jpeg = service.preview_jpeg(camNo, last_seq)
+                if jpeg is None:
+                    time.sleep(self.server.frame_interval)
+                    continue
+                last_seq = seq
+                self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                 + f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            service.remove_viewer(camNo)
+
+    def _websocket(self):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if not key or self.headers.get("Upgrade", "").lower() != "websocket":
+            self._send_json({"error": "expected a WebSocket upgrade"}, 400)
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.close_connection = True
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+
+        service = self.server.service
+        events = service.subscribe()
+        try:
+            # Start every client from a full snapshot, then stream changes
+            self.wfile.write(websocket_frame(json.dumps({"type": "slots", "slots": service.slots()}).encode()))
+            while True:
+                try:
+                    event = events.get(timeout=self.server.ping_interval)
+                except queue.Empty:
+                    # Ping so dead clients are noticed and dropped
+                    self.wfile.write(websocket_frame(b"", opcode=0x9))
+                    continue
+                self.wfile.write(websocket_frame(json.dumps(event).encode()))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            service.unsubscribe(events)
+
+
+class StatusServer(ThreadingHTTPServer):
+    """Local HTTP/WebSocket API over a ParkingService, one thread per client."""
+
+    daemon_threads = True
+
+    def __init__(self, address, service, max_fps=10.0, ping_interval=15.0):
+        super().__init__(address, StatusRequestHandler)
+        self.service = service
+        self.frame_interval = 1.0 / max_fps
+        self.ping_interval = ping_interval